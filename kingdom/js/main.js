@@ -195,7 +195,7 @@ document.addEventListener('DOMContentLoaded', async () => {
   twoExpansionsBox.checked = params.twoExpansions;
 
   // 2) Load card data
-  const { cards, events, projects, prophecies, othercards } = await loadCards({ 
+  const { cards, events, projects, prophecies, othercards, cardIndex } = await loadCards({ 
     baseOnly: params.baseOnly, 
     applyBlacklist: params.blacklist 
   });
@@ -207,7 +207,7 @@ document.addEventListener('DOMContentLoaded', async () => {
   currentState.othercards = othercards;
 
   // 3) Create card lists for efficient filtering
-  currentState.cardLists = await loadCardLists(cards, events, projects, prophecies, othercards);
+  currentState.cardLists = await loadCardLists(cards, events, projects, prophecies, othercards, cardIndex);
   
   // 4) Generate initial kingdom
   generateNewKingdom();
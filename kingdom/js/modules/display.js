@@ -1,5 +1,61 @@
 // js/modules/display.js - Display and UI interaction module
 
+// Resized AVIF/WebP variants and per-set sprite sheets written by
+// scripts/build_card_images.py; the <img> itself, and browsers without
+// either format, get the original scan
+const DERIVATIVES_DIR = './data/card_img_derivatives';
+const derivativesIndex = fetch(`${DERIVATIVES_DIR}/index.json`)
+  .then(res => (res.ok ? res.json() : null))
+  .catch(() => null);
+const spriteSheets = new Map();
+
+// Rendered card widths, matching the grids in style.css: ~5 columns of at
+// least 150px, kingdom cards also capped by their viewport-sized row height
+const CARD_SIZES = {
+  kingdom: '(max-width: 900px) max(150px, 19vw), min(14vw, calc((100vh - 22rem) * 5 / 16))',
+  upright: '(max-width: 900px) max(150px, 19vw), 14vw',
+  sideways: '(max-width: 900px) max(300px, 38vw), 28vw'
+};
+
+function spriteSheet(setId, width) {
+  if (!spriteSheets.has(setId)) {
+    spriteSheets.set(setId, fetch(`${DERIVATIVES_DIR}/${setId}/sprite.${width}.json`)
+      .then(res => (res.ok ? res.json() : null))
+      .catch(() => null));
+  }
+  return spriteSheets.get(setId);
+}
+
+// Point a <picture> at the derivatives, sized for where the card is shown.
+// Widths are the card's short side, so a sideways card's are 8/5 wider.
+function useDerivatives(picture, img, card, index, sizes, sideways) {
+  const base = `${DERIVATIVES_DIR}/${card.setId}/${card.id}`;
+  const srcset = fmt => index.widths
+    .map(w => `${base}.${w}.${fmt} ${sideways ? Math.round(w * 8 / 5) : w}w`)
+    .join(', ');
+  for (const fmt of ['avif', 'webp']) {
+    if (!index.formats.includes(fmt)) continue;
+    const source = document.createElement('source');
+    source.type = `image/${fmt}`;
+    source.srcset = srcset(fmt);
+    source.sizes = sizes;
+    picture.insertBefore(source, img);
+  }
+}
+
+// Show the card's tile from its set's sprite sheet until the image loads -
+// one request covers every card of a set, and later rerolls reuse it
+async function showPlaceholder(el, card, index) {
+  const sheet = await spriteSheet(card.setId, index.sprite_width);
+  const tile = sheet && sheet.cards[card.id];
+  if (!tile) return;
+  const [x, y, w, h] = tile;
+  const pos = (offset, size, total) => (total > size ? (offset / (total - size)) * 100 : 0);
+  el.style.backgroundImage = `url(${DERIVATIVES_DIR}/${card.setId}/${sheet.image})`;
+  el.style.backgroundSize = `${(sheet.width / w) * 100}% ${(sheet.height / h) * 100}%`;
+  el.style.backgroundPosition = `${pos(x, w, sheet.width)}% ${pos(y, h, sheet.height)}%`;
+}
+
 export function renderKingdom(kingdom, kingdomContainer = 'kingdom-cards', bonusTuple = [[], []]) {
   const [upbonuses, sidebonuses] = bonusTuple;
 
@@ -17,7 +73,7 @@ export function renderKingdom(kingdom, kingdomContainer = 'kingdom-cards', bonus
   sideEl.innerHTML = '';
 
   // Helper to create a card element
-  const createCard = (card, sideways = false) => {
+  const createCard = (card, sideways = false, sizes = CARD_SIZES.upright) => {
     const el = document.createElement('div');
     el.className = 'card' + (sideways ? ' sideways' : '');
     
@@ -26,10 +82,25 @@ export function renderKingdom(kingdom, kingdomContainer = 'kingdom-cards', bonus
     el.dataset.cardName = card.name || card.id;
     el.dataset.cardSet = card.setId;
     
+    const original = `./data/dominion_card_imgs/${card.setId}/${card.id}.jpg`;
+    const picture = document.createElement('picture');
     const img = document.createElement('img');
-    img.src = `./data/dominion_card_imgs/${card.setId}/${card.id}.jpg`;
     img.alt = card.name || card.id;
+    picture.appendChild(img);
+    derivativesIndex.then(index => {
+      if (index && index.sets.includes(card.setId)) {
+        useDerivatives(picture, img, card, index, sizes, sideways);
+        showPlaceholder(el, card, index);
+      }
+      img.src = original;
+    });
     img.onerror = function() {
+      if (picture.querySelector('source')) {
+        // A missing derivative: retry with the original scan
+        picture.querySelectorAll('source').forEach(source => source.remove());
+        this.src = original;
+        return;
+      }
       // Fallback for missing images
       this.style.display = 'none';
       const placeholder = document.createElement('div');
@@ -69,7 +140,7 @@ export function renderKingdom(kingdom, kingdomContainer = 'kingdom-cards', bonus
     overlay.appendChild(nameDisplay);
     overlay.appendChild(controls);
     
-    el.appendChild(img);
+    el.appendChild(picture);
     el.appendChild(overlay);
     
     // Add click event to show/hide overlay
@@ -125,11 +196,11 @@ export function renderKingdom(kingdom, kingdomContainer = 'kingdom-cards', bonus
   };
 
   // Render kingdom (upright)
-  kingdom.forEach(c => kingdomEl.appendChild(createCard(c)));
+  kingdom.forEach(c => kingdomEl.appendChild(createCard(c, false, CARD_SIZES.kingdom)));
 
   // Render upright bonuses
   upbonuses.forEach(c => upEl.appendChild(createCard(c)));
 
   // Render sideways bonuses
-  sidebonuses.forEach(c => sideEl.appendChild(createCard(c, true)));
+  sidebonuses.forEach(c => sideEl.appendChild(createCard(c, true, CARD_SIZES.sideways)));
 }
\ No newline at end of file
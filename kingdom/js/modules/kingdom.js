@@ -1,14 +1,117 @@
 // js/modules/kingdom.js - Kingdom generation with lock/reroll support
 
-// Load dominion cards, owned sets and blacklist
+// Resolve a data file to its content-hashed copy (scripts/publish_data.py)
+// via the always-revalidated manifest, fetched once per page load, or the
+// plain file if none is published
+const dataManifest = fetch('./data/dist/manifest.json', { cache: 'no-cache' })
+  .then((res) => (res.ok ? res.json() : { files: {} }))
+  .catch(() => ({ files: {} }));
+
+async function dataUrl(name) {
+  const entry = (await dataManifest).files[name];
+  return entry ? `./data/dist/${entry.path}` : `./data/${name}`;
+}
+
+// Bitsets from card_index.json (scripts/card_index.py): arrays of 32-bit
+// words, bit i of word w standing for card w*32+i in the index's order
+const CARD_INDEX_VERSION = 1;
+const CARD_GROUPS = ['cards', 'events', 'projects', 'prophecies', 'othercards'];
+
+function wordsAnd(a, b) {
+  return a.map((word, w) => word & (b[w] || 0));
+}
+
+function wordsAndNot(a, b) {
+  return a.map((word, w) => word & ~(b[w] || 0));
+}
+
+function wordsUnion(table, keys, wordCount) {
+  const out = new Array(wordCount).fill(0);
+  for (const key of keys) {
+    (table[key] || []).forEach((word, w) => { out[w] |= word; });
+  }
+  return out;
+}
+
+// Card positions whose bits are set, lowest first, skipping empty words
+function bitPositions(words) {
+  const out = [];
+  words.forEach((value, w) => {
+    let word = value | 0;
+    while (word) {
+      const low = word & -word;
+      out.push(w * 32 + 31 - Math.clz32(low));
+      word ^= low;
+    }
+  });
+  return out;
+}
+
+// Every card-like entry of dominion_cards.json in the order card_index.py
+// numbers them (sets, then groups, then entries, as in the file)
+function indexOrder(cardsData) {
+  const order = [];
+  for (const [setId, setInfo] of Object.entries(cardsData)) {
+    for (const [group, entries] of Object.entries(setInfo)) {
+      if (!Array.isArray(entries)) continue;
+      for (const c of entries) {
+        if (c && typeof c === 'object' && 'id' in c) order.push({ setId, group, card: c });
+      }
+    }
+  }
+  return order;
+}
+
+// Pick the owned, non-blacklisted cards of each group with bitwise ops over
+// the exported index, touching only the cards whose bits survive. Returns
+// null if the index doesn't match the card data, so the caller can scan.
+function selectIndexedCards(index, cardsData, mysets, blacklist, baseOnly, applyBlacklist) {
+  if (!index || index.version !== CARD_INDEX_VERSION || index.wordBits !== 32) return null;
+  const order = indexOrder(cardsData);
+  if (order.length !== index.count || order.some((entry, i) => entry.card.id !== index.ids[i])) {
+    console.warn('card_index.json is stale; filtering by scanning the cards instead');
+    return null;
+  }
+
+  const wordCount = Math.ceil(index.count / 32);
+  const owned = Object.keys(index.sets).filter(setId => mysets[setId] && (!baseOnly || setId === 'baseset2'));
+  let mask = wordsUnion(index.sets, owned, wordCount);
+  if (applyBlacklist && blacklist.length) {
+    const banned = new Set(blacklist);
+    const blacklistBits = new Array(wordCount).fill(0);
+    index.ids.forEach((id, i) => {
+      if (banned.has(id)) blacklistBits[i >> 5] |= 1 << (i & 31);
+    });
+    mask = wordsAndNot(mask, blacklistBits);
+  }
+
+  const byPosition = [];
+  const lists = {};
+  for (const group of CARD_GROUPS) {
+    lists[group] = bitPositions(wordsAnd(mask, index.groups[group] || [])).map(i => {
+      byPosition[i] = { ...order[i].card, setId: order[i].setId };
+      return byPosition[i];
+    });
+  }
+  const cardsMask = wordsAnd(mask, index.groups.cards || []);
+  return { lists, view: { index, cardsMask, byPosition } };
+}
+
+// Load dominion cards, owned sets and blacklist. Filtering goes through the
+// bitsets in card_index.json when it's published and current; `cardIndex`
+// in the result carries them on to loadCardLists (null when scanning).
 export async function loadCards(options = {}) {
   const { baseOnly = false, applyBlacklist = false } = options;
 
-  // Load all three JSON files at once
-  const [cardsRes, setsRes, blacklistRes] = await Promise.all([
-    fetch('./data/dominion_cards.json'),
+  // Load all four JSON files at once
+  const [cardsRes, setsRes, blacklistRes, index] = await Promise.all([
+    dataUrl('dominion_cards.json').then((url) => fetch(url)),
     fetch('./data/mysets.json'),
-    fetch('./data/blacklist.json')
+    fetch('./data/blacklist.json'),
+    dataUrl('card_index.json')
+      .then((url) => fetch(url))
+      .then((res) => (res.ok ? res.json() : null))
+      .catch(() => null)
   ]);
 
   if (!cardsRes.ok) throw new Error('Failed loading dominion_cards.json');
@@ -20,6 +123,12 @@ export async function loadCards(options = {}) {
   const mysets = await setsRes.json();
   const blacklist = blacklistRes.ok ? await blacklistRes.json() : [];
 
+  const indexed = selectIndexedCards(index, cardsData, mysets, blacklist, baseOnly, applyBlacklist);
+  if (indexed) {
+    const { cards, events, projects, prophecies, othercards } = indexed.lists;
+    return { cards, events, projects, prophecies, othercards, cardIndex: indexed.view };
+  }
+
   // Containers for each type
   const cards = [];
   const events = [];
@@ -49,23 +158,32 @@ export async function loadCards(options = {}) {
     addCardsFromGroup(setInfo.othercards, othercards);
   }
 
-  return { cards, events, projects, prophecies, othercards };
+  return { cards, events, projects, prophecies, othercards, cardIndex: null };
 }
 
 // Create categorized lists of cards for efficient filtering
-export async function loadCardLists(cards, events, projects, prophecies, othercards) {
+export async function loadCardLists(cards, events, projects, prophecies, othercards, cardIndex = null) {
+  // Cards with all of the given tags: ANDed bitsets when loadCards used the
+  // index, otherwise a scan
+  const withTags = (...tags) => {
+    if (!cardIndex) return cards.filter(c => tags.every(t => c[t]));
+    const { index, cardsMask, byPosition } = cardIndex;
+    const mask = tags.reduce((bits, t) => wordsAnd(bits, index.tags[t] || []), cardsMask);
+    return bitPositions(mask).map(i => byPosition[i]);
+  };
+
   // Create filtered lists for common requirements
-  const actionSuppliers = cards.filter(c => c.isActionSupplier);
-  const drawers = cards.filter(c => c.isDrawer);
-  const attacks = cards.filter(c => c.isAttack);
-  const reactions = cards.filter(c => c.isReaction);
-  const durations = cards.filter(c => c.isDuration);
+  const actionSuppliers = withTags('isActionSupplier');
+  const drawers = withTags('isDrawer');
+  const attacks = withTags('isAttack');
+  const reactions = withTags('isReaction');
+  const durations = withTags('isDuration');
   
   // Cards that satisfy multiple requirements (useful for optimization)
-  const actionDrawers = cards.filter(c => c.isActionSupplier && c.isDrawer);
-  const attackReactions = cards.filter(c => c.isAttack && c.isReaction);
-  const actionAttacks = cards.filter(c => c.isActionSupplier && c.isAttack);
-  const drawAttacks = cards.filter(c => c.isDrawer && c.isAttack);
+  const actionDrawers = withTags('isActionSupplier', 'isDrawer');
+  const attackReactions = withTags('isAttack', 'isReaction');
+  const actionAttacks = withTags('isActionSupplier', 'isAttack');
+  const drawAttacks = withTags('isDrawer', 'isAttack');
   
   // Cost-based lists for balanced kingdoms
   const cheapCards = cards.filter(c => cardCostValue(c) <= 3);
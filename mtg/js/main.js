@@ -29,11 +29,12 @@ async function loadData() {
         loadingText.textContent = 'Loading collection data...';
         loadingProgress.style.width = '10%';
 
+        const manifest = await fetchManifest();
         const [collectionData, decksData, bindersData, boxesData] = await Promise.all([
-            fetchJson('./data/collection.json'),
-            fetchJson('./data/decks.json'),
-            fetchJson('./data/binders.json'),
-            fetchJson('./data/boxes.json')
+            fetchJson(dataUrl(manifest, 'collection.json')),
+            fetchJson(dataUrl(manifest, 'decks.json')),
+            fetchJson(dataUrl(manifest, 'binders.json')),
+            fetchJson(dataUrl(manifest, 'boxes.json'))
         ]);
 
         loadingProgress.style.width = '30%';
@@ -90,6 +91,23 @@ async function loadData() {
     }
 }
 
+// Manifest of content-hashed data copies written by scripts/publish_data.py.
+// Always revalidated; the hashed files it points at never change under their
+// name. Missing manifest -> plain ./data/*.json.
+async function fetchManifest() {
+    try {
+        const response = await fetch('./data/dist/manifest.json', { cache: 'no-cache' });
+        return response.ok ? await response.json() : { files: {} };
+    } catch {
+        return { files: {} };
+    }
+}
+
+function dataUrl(manifest, name) {
+    const entry = manifest.files[name];
+    return entry ? `./data/dist/${entry.path}` : `./data/${name}`;
+}
+
 async function fetchJson(url) {
     try {
         const response = await fetch(url);
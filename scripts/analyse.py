@@ -147,7 +147,9 @@ def check_data_quality(all_cards):
     return issues
 
 if __name__ == "__main__":
-    json_file_path = "dominion_randomizer/data/dominion_cards.json"
+    import sys
+
+    json_file_path = sys.argv[1] if len(sys.argv) > 1 else "dominion_randomizer/data/dominion_cards.json"
     
     try:
         all_cards, set_stats, tag_stats = comprehensive_card_analysis(json_file_path)
@@ -4,17 +4,30 @@ apply_changes.py - Apply changes.json to MTG collection data files.
 
 Usage:
     python scripts/apply_changes.py [changes.json] [--data-dir ./mtg/data]
+                                    [--scryfall-index .scryfall/cards.idx]
 
 Reads a changes.json file exported from the MTG Collection Manager web UI
 and applies the described modifications to collection.json, decks.json,
-and binders.json. Validates allocations and writes clean, sorted output.
+and binders.json. Validates allocations and writes clean, sorted output,
+then republishes the data directory (see publish_data.py).
+
+If a local Scryfall index has been built (see scryfall_index.py), card
+details for added cards come from it rather than from the export, blanks
+in existing collection entries are filled in, and every id in the data is
+checked against it (unknown ids, finishes a printing doesn't come in).
 """
 
 import json
 import sys
 import os
+import tempfile
 from datetime import datetime
 
+from publish_data import load_brotli, publish_dir, print_row
+from scryfall_index import INDEX_PATH, open_index
+
+CARD_FIELDS = ('name', 'set', 'collector_number', 'oracle_id')
+
 
 def load_json(filepath):
     """Load a JSON file, return empty structure if not found."""
@@ -28,14 +41,52 @@ def load_json(filepath):
 
 
 def save_json(filepath, data, sort_keys=True):
-    """Write JSON with consistent formatting."""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=sort_keys)
-        f.write('\n')
-
-
-def apply_collection_changes(collection, changes, boxes):
-    """Apply collection_changes to the collection dict."""
+    """Write JSON with consistent formatting, via a temp file so a reader
+    (or a crash) never sees a half-written file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filepath) or '.', prefix='.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+            f.write('\n')
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def card_finish(sid):
+    """Finish implied by a collection key ("<id>:foil" -> foil)."""
+    return 'foil' if ':foil' in sid else 'nonfoil'
+
+
+def check_finish(sid, card):
+    """Warn if the index says this printing doesn't come in the key's finish."""
+    finish = card_finish(sid)
+    if card and card['finishes'] and finish not in card['finishes']:
+        print(f"  ! Warning: {card['name']} ({card['set'].upper()} {card['collector_number']}) "
+              f"has no {finish} printing (finishes: {', '.join(card['finishes'])})")
+
+
+def card_details(change, sid, index):
+    """Name/set/collector number/oracle id for a newly added card: from the
+    Scryfall index when it knows the id, otherwise as exported."""
+    exported = {f: change.get(f, '') for f in CARD_FIELDS}
+    if index is None:
+        return exported
+    card = index.get(sid)
+    if card is None:
+        print(f"  ! Warning: {sid} ({exported['name'] or 'unnamed'}) is not in the Scryfall index")
+        return exported
+    for f in CARD_FIELDS:
+        if exported[f] and exported[f] != card[f]:
+            print(f"    ~ {f} from export {exported[f]!r} corrected to {card[f]!r}")
+    check_finish(sid, card)
+    return {f: card[f] for f in CARD_FIELDS}
+
+
+def apply_collection_changes(collection, changes, boxes, index=None):
+    """Apply collection_changes to the collection dict. With a Scryfall index,
+    added cards' details come from it."""
     decktop = next((b for b in boxes if b.get('is_decktop')), None)
 
     for change in changes:
@@ -49,16 +100,17 @@ def apply_collection_changes(collection, changes, boxes):
                 print(f"  + Updated quantity of {change.get('name', sid)}: "
                       f"now {collection[sid]['quantity']}")
             else:
+                details = card_details(change, sid, index)
                 collection[sid] = {
                     'quantity': qty,
-                    'oracle_id': change.get('oracle_id', ''),
-                    'name': change.get('name', ''),
-                    'set': change.get('set', ''),
-                    'collector_number': change.get('collector_number', ''),
-                    'finish': 'foil' if ':foil' in sid else 'nonfoil'
+                    'oracle_id': details['oracle_id'],
+                    'name': details['name'],
+                    'set': details['set'],
+                    'collector_number': details['collector_number'],
+                    'finish': card_finish(sid)
                 }
-                print(f"  + Added {change.get('name', sid)} "
-                      f"({change.get('set', '').upper()}) x{qty}")
+                print(f"  + Added {details['name'] or sid} "
+                      f"({details['set'].upper()}) x{qty}")
             # New cards land in Decktop
             if decktop is not None:
                 decktop_cards = decktop.setdefault('cards', [])
@@ -91,11 +143,16 @@ def apply_collection_changes(collection, changes, boxes):
         elif action == 'change_finish':
             old_id = change.get('old_id')
             new_id = change.get('new_id')
+            if not new_id:
+                print(f"  ! Warning: Cannot change finish of {old_id} (no new_id)")
+                continue
             if old_id and old_id in collection:
                 entry = collection.pop(old_id)
-                entry['finish'] = 'foil' if ':foil' in new_id else 'nonfoil'
+                entry['finish'] = card_finish(new_id)
                 collection[new_id] = entry
                 print(f"  ~ Changed finish: {old_id} -> {new_id}")
+                if index is not None:
+                    check_finish(new_id, index.get(new_id))
             # Update Decktop references
             if decktop is not None:
                 for card in decktop.get('cards', []):
@@ -217,6 +274,36 @@ def validate_allocations(collection, decks, binders):
         print(f"  {warnings} over-allocation warning(s).")
 
 
+def check_against_index(collection, decks, binders, boxes, index):
+    """Fill blank card details in the collection from the Scryfall index and
+    report ids it doesn't know or finishes their printing lacks."""
+    filled = 0
+    for sid, entry in collection.items():
+        card = index.get(sid)
+        if card is None:
+            continue
+        for f in CARD_FIELDS:
+            if not entry.get(f) and card[f]:
+                entry[f] = card[f]
+                filled += 1
+
+    referenced = set(collection)
+    for group in (decks, binders, boxes):
+        for item in group:
+            referenced.update(c['scryfall_id'] for c in item.get('cards', []))
+    unknown = 0
+    for sid in sorted(referenced):
+        card = index.get(sid)
+        if card is None:
+            name = collection.get(sid, {}).get('name', '')
+            print(f"  ! Unknown id: {sid}" + (f" ({name})" if name else ''))
+            unknown += 1
+        else:
+            check_finish(sid, card)
+
+    print(f"  {len(referenced)} id(s) checked, {unknown} unknown, {filled} blank field(s) filled.")
+
+
 def sort_collection(collection):
     """Sort collection by card name then set."""
     return dict(sorted(
@@ -229,6 +316,7 @@ def main():
     # Parse arguments
     changes_path = 'changes.json'
     data_dir = './mtg/data'
+    index_path = INDEX_PATH
 
     args = sys.argv[1:]
     i = 0
@@ -236,6 +324,9 @@ def main():
         if args[i] == '--data-dir' and i + 1 < len(args):
             data_dir = args[i + 1]
             i += 2
+        elif args[i] == '--scryfall-index' and i + 1 < len(args):
+            index_path = args[i + 1]
+            i += 2
         elif not args[i].startswith('--'):
             changes_path = args[i]
             i += 1
@@ -245,7 +336,8 @@ def main():
     # Check changes file exists
     if not os.path.exists(changes_path):
         print(f"Error: {changes_path} not found.")
-        print(f"Usage: python scripts/apply_changes.py [changes.json] [--data-dir ./mtg/data]")
+        print(f"Usage: python scripts/apply_changes.py [changes.json] [--data-dir ./mtg/data] "
+              f"[--scryfall-index .scryfall/cards.idx]")
         sys.exit(1)
 
     print(f"Loading changes from: {changes_path}")
@@ -262,11 +354,19 @@ def main():
     print(f"Changes timestamp: {changes.get('timestamp', 'unknown')}")
     print()
 
+    index = open_index(index_path)
+    if index is not None:
+        print(f"Scryfall index: {len(index)} cards ({index.meta.get('source', '?')})")
+    else:
+        print("No Scryfall index - card details taken from the export as-is "
+              "(build one with scripts/scryfall_index.py).")
+    print()
+
     # Apply collection changes
     cc = changes.get('collection_changes', [])
     if cc:
         print(f"Applying {len(cc)} collection change(s):")
-        apply_collection_changes(collection, cc, boxes)
+        apply_collection_changes(collection, cc, boxes, index)
         print()
 
     # Apply deck changes
@@ -288,6 +388,12 @@ def main():
     validate_allocations(collection, decks, binders)
     print()
 
+    if index is not None:
+        print("Checking ids against the Scryfall index:")
+        check_against_index(collection, decks, binders, boxes, index)
+        index.close()
+        print()
+
     # Sort and save
     collection = sort_collection(collection)
     save_json(os.path.join(data_dir, 'collection.json'), collection)
@@ -296,6 +402,13 @@ def main():
     save_json(os.path.join(data_dir, 'boxes.json'), boxes, sort_keys=False)
 
     print("Data files updated successfully.")
+    print()
+
+    # Refresh the content-hashed copies the page actually loads
+    print("Publishing:")
+    for row in publish_dir(data_dir, load_brotli()):
+        print_row(*row)
+    print()
 
     # Rename changes file as backup
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
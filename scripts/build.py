@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""build.py - runs the scripts/ data pipelines as one dependency graph,
+skipping every step whose inputs haven't changed since it last ran and
+running independent steps side by side. Pure standard library, no
+dependencies.
+
+    python scripts/build.py                   # everything that's out of date
+    python scripts/build.py --list            # what would run, and why
+    python scripts/build.py stores:walmart    # one step (plus what it needs)
+    python scripts/build.py kingdom           # every kingdom:* step
+
+Steps (see build_steps()) are the existing scripts, run as subprocesses with
+the flags they'd get by hand:
+
+    stores:<slug>        fetch_store_locations.py --only <slug>, per chain
+    stores:publish       publish_data.py for stores/data
+    kingdom:card-index   card_index.py
+    kingdom:analysis     analyse.py, its report saved to .build/reports/
+    kingdom:publish      publish_data.py for kingdom/data
+    kingdom:images       download_dominion_imgs.py     (only when named)
+    kingdom:derivatives  build_card_images.py          (only when named)
+    mtg:apply            apply_changes.py, when a changes.json is waiting
+    mtg:publish          publish_data.py for mtg/data
+
+A step's key is a hash of its input files' contents, the source of the
+code it runs, and the configuration that shapes its output - for a chain
+that's just its own CHAINS entry plus the shared settings (dedup threshold,
+OVERTURE_RELEASE, Overture confidence cutoff, US bounds), so editing one
+chain's osm_names reruns that chain and then only the steps downstream of
+its file. .build/state.json remembers each step's last key and output
+hashes; a step reruns when its key changes, an output has gone missing, or
+--force says so. Outputs feed downstream keys by content, so a rerun that
+produces identical bytes stops there.
+
+The store fetches read live servers, so identical inputs don't guarantee
+identical data - --max-age DAYS reruns network steps last built longer ago
+than that. Network steps also run --network-jobs at a time (default 1, to
+stay polite to the public Overpass servers), each starting at least
+--network-gap seconds (default 8, fetch_store_locations.py's own --delay
+between chains) after the last one finished; everything else up to --jobs.
+Each step's output goes to .build/logs/<step>.log.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from chain_config import CHAINS, SUBDEPARTMENT_KEYWORDS, US_BOUNDS
+from fetch_store_locations import OVERTURE_MIN_CONFIDENCE, OVERTURE_RELEASE
+from reverse_geocode import PLACES_PATH, STATES_PATH
+from scryfall_index import INDEX_PATH as SCRYFALL_INDEX_PATH
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+BUILD_DIR = os.path.join(REPO_ROOT, ".build")
+STATE_PATH = os.path.join(BUILD_DIR, "state.json")
+LOG_DIR = os.path.join(BUILD_DIR, "logs")
+
+STORES_DATA = "stores/data"
+KINGDOM_DATA = "kingdom/data"
+MTG_DATA = "mtg/data"
+MTG_FILES = ["collection.json", "decks.json", "binders.json", "boxes.json"]
+
+
+def rel(*parts):
+    return os.path.join(*parts).replace(os.sep, "/")
+
+
+def script(name):
+    return rel("scripts", name)
+
+
+class Step:
+    """One node of the graph. Paths are repo-relative; `code` files are
+    inputs too, kept separate only so --list can say "code changed"."""
+
+    def __init__(self, name, cmd, inputs=(), code=(), config=None, outputs=(), deps=(), network=False,
+                 default=True, when=None, report=None, extra=()):
+        self.name = name
+        self.cmd = cmd  # argv after the interpreter, run from the repo root
+        self.extra = list(extra)  # more argv that changes how, not what - not part of the key
+        self.inputs = list(inputs)
+        self.code = list(code)
+        self.config = config or {}
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.network = network
+        self.default = default  # part of a bare `build.py` run
+        self.when = when  # callable: is there anything for this step to do?
+        self.report = report  # save stdout here (repo-relative) as the output
+
+
+def build_steps(args):
+    """The graph, for the options given."""
+    steps = []
+    fetch_code = [script(f) for f in (
+        "fetch_store_locations.py", "geo_utils.py", "record_store.py", "overpass_pool.py",
+    )]
+    shared = {
+        "dedup_threshold": args.dedup_threshold,
+        "overture_release": OVERTURE_RELEASE,
+        "overture_min_confidence": OVERTURE_MIN_CONFIDENCE,
+        "us_bounds": US_BOUNDS,
+        "subdepartment_keywords": SUBDEPARTMENT_KEYWORDS,
+        "osm_only": args.osm_only,
+        "fill_places": args.fill_places,
+    }
+    fetch_flags = ["--dedup-threshold", str(args.dedup_threshold), "--no-publish"]
+    fetch_extra = ["--delay", "0"]
+    fetch_inputs = []
+    if args.osm_only:
+        fetch_flags.append("--osm-only")
+    if args.sharded:
+        fetch_extra.append("--sharded")
+    for url in args.overpass_url or ():
+        fetch_extra += ["--overpass-url", url]
+    if args.fill_places:
+        fetch_flags.append("--fill-places")
+        fetch_code.append(script("reverse_geocode.py"))
+        fetch_inputs += [os.path.relpath(p, REPO_ROOT) for p in (STATES_PATH, PLACES_PATH)]
+
+    chain_files = []
+    for slug, chain in CHAINS.items():
+        out = rel(STORES_DATA, f"{slug}.json")
+        chain_files.append(out)
+        steps.append(Step(
+            f"stores:{slug}",
+            [script("fetch_store_locations.py"), "--only", slug] + fetch_flags,
+            inputs=fetch_inputs,
+            code=fetch_code,
+            config={"chain": chain, **shared},
+            outputs=[out],
+            network=True,
+            extra=fetch_extra,
+        ))
+    steps.append(publish_step("stores", STORES_DATA, chain_files, [f"stores:{slug}" for slug in CHAINS]))
+
+    cards = rel(KINGDOM_DATA, "dominion_cards.json")
+    card_index = rel(KINGDOM_DATA, "card_index.json")
+    steps.append(Step(
+        "kingdom:card-index",
+        [script("card_index.py")],
+        inputs=[cards],
+        code=[script("card_index.py")],
+        outputs=[card_index],
+    ))
+    steps.append(Step(
+        "kingdom:analysis",
+        [script("analyse.py"), cards],
+        inputs=[cards],
+        code=[script("analyse.py")],
+        report=rel(".build", "reports", "kingdom-analysis.txt"),
+    ))
+    steps.append(publish_step("kingdom", KINGDOM_DATA, [cards, card_index], ["kingdom:card-index"]))
+    img_manifest = rel(KINGDOM_DATA, "dominion_card_imgs", "manifest.json")
+    steps.append(Step(
+        "kingdom:images",
+        [script("download_dominion_imgs.py")],
+        inputs=[cards, rel(KINGDOM_DATA, "mysets.json")],
+        code=[script("download_dominion_imgs.py")],
+        outputs=[img_manifest],
+        network=True,
+        default=False,
+    ))
+    steps.append(Step(
+        "kingdom:derivatives",
+        [script("build_card_images.py")],
+        inputs=[img_manifest],
+        code=[script("build_card_images.py")],
+        outputs=[rel(KINGDOM_DATA, "card_img_derivatives", f) for f in ("manifest.json", "index.json")],
+        deps=["kingdom:images"],
+        default=False,
+    ))
+
+    mtg_files = [rel(MTG_DATA, f) for f in MTG_FILES]
+    mtg_inputs = ["changes.json"] + mtg_files
+    if os.path.exists(SCRYFALL_INDEX_PATH):
+        mtg_inputs.append(os.path.relpath(SCRYFALL_INDEX_PATH, REPO_ROOT))
+    steps.append(Step(
+        "mtg:apply",
+        [script("apply_changes.py"), "changes.json", "--data-dir", MTG_DATA],
+        inputs=mtg_inputs,
+        code=[script(f) for f in ("apply_changes.py", "scryfall_index.py", "publish_data.py")],
+        outputs=mtg_files,
+        when=lambda: os.path.exists(os.path.join(REPO_ROOT, "changes.json")),
+    ))
+    all_mtg = sorted(rel(MTG_DATA, f) for f in os.listdir(os.path.join(REPO_ROOT, MTG_DATA)) if f.endswith(".json"))
+    steps.append(publish_step("mtg", MTG_DATA, all_mtg, ["mtg:apply"]))
+    return {s.name: s for s in steps}
+
+
+def publish_step(prefix, data_dir, files, deps):
+    return Step(
+        f"{prefix}:publish",
+        [script("publish_data.py"), "--dir", data_dir],
+        inputs=files,
+        code=[script("publish_data.py")],
+        outputs=[rel(data_dir, "dist", "manifest.json")],
+        deps=deps,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Hashing / state
+# ---------------------------------------------------------------------------
+_file_hashes = {}  # (path, size, mtime_ns) -> sha256, within one run
+
+
+def file_hash(path):
+    """sha256 of a repo-relative file, or None if it doesn't exist."""
+    full = os.path.join(REPO_ROOT, path)
+    try:
+        st = os.stat(full)
+    except FileNotFoundError:
+        return None
+    memo = (path, st.st_size, st.st_mtime_ns)
+    if memo not in _file_hashes:
+        h = hashlib.sha256()
+        with open(full, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _file_hashes[memo] = h.hexdigest()
+    return _file_hashes[memo]
+
+
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def fingerprint(step):
+    """Everything a step's key is made of, split out so changes can be named."""
+    return {
+        "cmd": digest(step.cmd),
+        "config": digest(step.config),
+        "inputs": {p: file_hash(p) for p in step.inputs},
+        "code": {p: file_hash(p) for p in step.code},
+    }
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=BUILD_DIR, prefix=".", suffix=".part")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def why_dirty(step, fp, record, args):
+    """Reason this step needs to run, or None if it's up to date."""
+    if args.force:
+        return "forced"
+    if record is None:
+        return "never built"
+    old = record["fingerprint"]
+    if old["cmd"] != fp["cmd"]:
+        return "command changed"
+    if old["config"] != fp["config"]:
+        return "config changed"
+    for kind in ("inputs", "code"):
+        changed = sorted(p for p in set(fp[kind]) | set(old[kind]) if fp[kind].get(p) != old[kind].get(p))
+        if changed:
+            return f"{kind} changed: {', '.join(os.path.basename(p) for p in changed)}"
+    missing = [p for p in step.outputs + ([step.report] if step.report else []) if file_hash(p) is None]
+    if missing:
+        return f"output missing: {', '.join(missing)}"
+    if args.max_age is not None and step.network and time.time() - record["built"] > args.max_age * 86400:
+        return f"older than {args.max_age:g} day(s)"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+def select(steps, targets):
+    """Steps named by targets (exact names or `prefix` for prefix:*) plus
+    everything they depend on, in declaration order."""
+    if targets:
+        chosen = set()
+        for t in targets:
+            hits = [n for n in steps if n == t or n.startswith(t + ":")]
+            if not hits:
+                print(f"Unknown step {t!r}. Steps: {', '.join(steps)}")
+                sys.exit(1)
+            chosen.update(hits)
+    else:
+        chosen = {n for n, s in steps.items() if s.default}
+    stack = list(chosen)
+    while stack:
+        for dep in steps[stack.pop()].deps:
+            if dep not in chosen:
+                chosen.add(dep)
+                stack.append(dep)
+    return [n for n in steps if n in chosen]
+
+
+def run_step(step):
+    """Run one step's command, logging to .build/logs. Returns (ok, seconds)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, step.name.replace(":", "_") + ".log")
+    started = time.monotonic()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [sys.executable] + step.cmd + step.extra,
+            cwd=REPO_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+        )
+        output = proc.stdout.decode("utf-8", "replace")
+        log.write(output)
+    if proc.returncode == 0 and step.report:
+        os.makedirs(os.path.dirname(os.path.join(REPO_ROOT, step.report)), exist_ok=True)
+        with open(os.path.join(REPO_ROOT, step.report), "w", encoding="utf-8") as f:
+            f.write(output)
+    return proc.returncode == 0, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help="steps or step prefixes to build (default: all default steps)")
+    parser.add_argument("--list", action="store_true", help="show each selected step's status and exit")
+    parser.add_argument("--force", action="store_true", help="rerun selected steps even if up to date")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="concurrent local steps")
+    parser.add_argument("--network-jobs", type=int, default=1, help="concurrent network steps (default 1)")
+    parser.add_argument(
+        "--network-gap",
+        type=float,
+        default=8.0,
+        help="seconds between one network step finishing and the next starting (default 8; 0 for a local stand-in)",
+    )
+    parser.add_argument("--max-age", type=float, help="rerun network steps last built more than this many days ago")
+    parser.add_argument("--dedup-threshold", type=float, default=120.0, help="passed to every store fetch")
+    parser.add_argument("--osm-only", action="store_true", help="passed to every store fetch")
+    parser.add_argument("--sharded", action="store_true", help="passed to every store fetch (not part of the key)")
+    parser.add_argument(
+        "--overpass-url",
+        action="append",
+        help="passed to every store fetch, e.g. a local stand-in (not part of the key)",
+    )
+    parser.add_argument("--fill-places", action="store_true", help="passed to every store fetch")
+    args = parser.parse_args()
+
+    steps = build_steps(args)
+    order = select(steps, args.targets)
+    state = load_state()
+
+    if args.list:
+        def status(name):
+            step = steps[name]
+            if step.when is not None and not step.when():
+                return None
+            return why_dirty(step, fingerprint(step), state.get(name), args)
+
+        for name in order:
+            step = steps[name]
+            if step.when is not None and not step.when():
+                label = "nothing to do"
+            elif any(status(d) for d in step.deps if d in order):
+                label = "after upstream"
+            else:
+                label = status(name) or "up to date"
+            print(f"  {name:<22}{'[net] ' if step.network else '      '}{label}")
+        return
+
+    done, failed, pending = set(), set(), list(order)
+    running = {}
+    counts = {"ran": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+    network_free_at = 0.0  # monotonic time the next network step may start
+    with ThreadPoolExecutor(max_workers=args.jobs + args.network_jobs) as pool:
+        while pending or running:
+            hold = None  # seconds until a network step held back by the gap may start
+            for name in list(pending):
+                step = steps[name]
+                deps = [d for d in step.deps if d in order]
+                if any(d in failed for d in deps):
+                    print(f"  -- {name}: skipped, a dependency failed")
+                    pending.remove(name)
+                    failed.add(name)
+                    continue
+                if not all(d in done for d in deps):
+                    continue
+                if step.when is not None and not step.when():
+                    pending.remove(name)
+                    done.add(name)
+                    continue
+                fp = fingerprint(step)
+                reason = why_dirty(step, fp, state.get(name), args)
+                if reason is None:
+                    pending.remove(name)
+                    done.add(name)
+                    counts["skipped"] += 1
+                    continue
+                busy = sum(1 for s in running.values() if steps[s[0]].network == step.network)
+                if busy >= (args.network_jobs if step.network else args.jobs):
+                    continue
+                if step.network and time.monotonic() < network_free_at:
+                    hold = network_free_at - time.monotonic()
+                    continue
+                print(f"  >> {name} ({reason})")
+                pending.remove(name)
+                running[pool.submit(run_step, step)] = (name, fp)
+            if not running:
+                if hold is not None:
+                    time.sleep(hold)
+                continue
+            finished, _ = wait(running, timeout=hold, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, fp = running.pop(fut)
+                step = steps[name]
+                ok, seconds = fut.result()
+                if step.network:
+                    network_free_at = time.monotonic() + args.network_gap
+                if ok:
+                    done.add(name)
+                    counts["ran"] += 1
+                    state[name] = {
+                        "fingerprint": fp,
+                        "outputs": {p: file_hash(p) for p in step.outputs},
+                        "built": time.time(),
+                    }
+                    save_state(state)
+                    print(f"  ok {name} ({seconds:.1f}s)")
+                else:
+                    failed.add(name)
+                    counts["failed"] += 1
+                    print(f"  !! {name} FAILED ({seconds:.1f}s) - see .build/logs/{name.replace(':', '_')}.log")
+
+    print(f"\n{counts['ran']} ran, {counts['skipped']} up to date, {counts['failed']} failed "
+          f"in {time.monotonic() - started:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
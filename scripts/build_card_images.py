@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""build_card_images.py - builds smaller derivatives of the Dominion card art
+that download_dominion_imgs.py fetches, for the kingdom page.
+
+For every kingdom/data/dominion_card_imgs/<set>/<id>.jpg this writes, under
+kingdom/data/card_img_derivatives/<set>/:
+
+    <id>.<width>.webp / .avif           - one per width in --widths (the
+                                          short side, for landscape cards)
+    sprite.<width>.webp                 - every card in the set on one sheet,
+                                          at --sprite-width
+    sprite.<width>.json                 - {card id: [x, y, w, h]} offsets
+
+plus card_img_derivatives/index.json, which tells the kingdom page what was
+built: it serves the cards through <picture>/srcset over these variants
+and uses a set's sprite sheet as the placeholder while a card loads - one
+request for every card of that set. No JPEG variants are made: the <img>
+inside the <picture> is the original scan, which is what a browser without
+WebP or AVIF gets, and most scans are already about the largest width.
+
+Run it after downloading images:
+
+    python scripts/download_dominion_imgs.py
+    python scripts/build_card_images.py
+
+Needs:
+
+    pip install pillow
+
+AVIF output needs a Pillow build with AVIF support (Pillow 11.3+, or the
+pillow-avif-plugin package); without it AVIF variants are skipped with a
+message and everything else is still built.
+
+Incremental: card_img_derivatives/manifest.json records the sha256 of each
+source image it was built from, and only sources whose hash changed (or whose
+outputs went missing) are re-encoded - on a pool of worker processes, since encoding is
+CPU-bound. A set's sprite sheets are only redrawn when one of its cards was
+rebuilt or removed; the outputs of removed cards (and sets) are pruned.
+--force rebuilds everything.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+KINGDOM_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "kingdom", "data")
+SRC_DIR = os.path.join(KINGDOM_DATA_DIR, "dominion_card_imgs")
+OUT_DIR = os.path.join(KINGDOM_DATA_DIR, "card_img_derivatives")
+MANIFEST_NAME = "manifest.json"
+PAGE_INDEX_NAME = "index.json"
+
+# Most scans are 296px across: full-size WebP/AVIF re-encodes are most of the
+# saving; 148 serves small windows on 1x screens. Narrower would go unused -
+# the page never shows a card much under 140px wide, and the sprite sheets
+# cover the placeholders.
+DEFAULT_WIDTHS = (148, 296)
+DEFAULT_SPRITE_WIDTH = 96
+SPRITE_COLUMNS = 10
+QUALITY = {"webp": 80, "avif": 60}
+PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def avif_supported():
+    from PIL import features
+
+    try:
+        return bool(features.check("avif"))
+    except ValueError:
+        # Older Pillow doesn't know the feature name at all - the plugin
+        # package registers AVIF as a save format instead.
+        from PIL import Image
+
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            pass
+        return "AVIF" in Image.SAVE
+
+
+def save_atomic(img, path, fmt, **params):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".part")
+    os.close(fd)
+    try:
+        img.save(tmp, PIL_FORMATS[fmt], **params)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def resized(img, width):
+    """img scaled so its short side is `width` - a card's width as printed,
+    so a landscape card comes out as wide as it's tall on the page. Never
+    scales up."""
+    from PIL import Image
+
+    scale = width / min(img.width, img.height)
+    if scale >= 1:
+        return img.copy()
+    return img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+
+
+def derivative_paths(out_dir, set_id, card_id, widths, formats):
+    return [os.path.join(out_dir, set_id, f"{card_id}.{w}.{fmt}") for w in widths for fmt in formats]
+
+
+def build_derivatives(src_path, out_dir, set_id, card_id, widths, formats):
+    """Worker: encode every width/format of one source image."""
+    from PIL import Image
+
+    with Image.open(src_path) as im:
+        im = im.convert("RGB")
+        for w in widths:
+            small = resized(im, w)
+            for fmt in formats:
+                path = os.path.join(out_dir, set_id, f"{card_id}.{w}.{fmt}")
+                save_atomic(small, path, fmt, quality=QUALITY[fmt])
+    return set_id, card_id
+
+
+def build_sprite(src_dir, out_dir, set_id, card_ids, width):
+    """Worker: lay every card of a set out in rows of SPRITE_COLUMNS and write
+    the sheet plus its offsets JSON. Each row is laid out by its tiles' own
+    widths, since landscape cards come out wider than `width`. Cards are
+    resized from the source, not the per-card derivatives, so a sheet never
+    depends on lossy output of another step."""
+    from PIL import Image
+
+    tiles = []
+    for card_id in card_ids:
+        with Image.open(os.path.join(src_dir, set_id, f"{card_id}.jpg")) as im:
+            tiles.append((card_id, resized(im.convert("RGB"), width)))
+    cell_h = max(t.height for _, t in tiles)
+    rows = [tiles[i:i + SPRITE_COLUMNS] for i in range(0, len(tiles), SPRITE_COLUMNS)]
+    sheet_w = max(sum(t.width for _, t in row) for row in rows)
+    sheet = Image.new("RGB", (sheet_w, len(rows) * cell_h), "white")
+    offsets = {}
+    for r, row in enumerate(rows):
+        x, y = 0, r * cell_h
+        for card_id, tile in row:
+            sheet.paste(tile, (x, y))
+            offsets[card_id] = [x, y, tile.width, tile.height]
+            x += tile.width
+
+    save_atomic(sheet, os.path.join(out_dir, set_id, f"sprite.{width}.webp"), "webp", quality=QUALITY["webp"])
+    offsets_path = os.path.join(out_dir, set_id, f"sprite.{width}.json")
+    with open(offsets_path, "w", encoding="utf-8") as f:
+        json.dump({"image": f"sprite.{width}.webp", "width": sheet.width, "height": sheet.height, "cards": offsets}, f)
+    return set_id, width
+
+
+def prune_outputs(out_dir, set_id, expected):
+    """Delete everything in a set's output directory that isn't `expected`.
+    Returns the number of files removed."""
+    set_dir = os.path.join(out_dir, set_id)
+    removed = 0
+    for name in os.listdir(set_dir):
+        if name.startswith(".") or name in expected:
+            continue
+        os.remove(os.path.join(set_dir, name))
+        removed += 1
+    return removed
+
+
+def scan_sources(src_dir):
+    """{set_id: sorted [card_id, ...]} for every <set>/<id>.jpg on disk."""
+    sources = {}
+    for set_id in sorted(os.listdir(src_dir)):
+        set_dir = os.path.join(src_dir, set_id)
+        if not os.path.isdir(set_dir):
+            continue
+        ids = sorted(f[:-4] for f in os.listdir(set_dir) if f.endswith(".jpg"))
+        if ids:
+            sources[set_id] = ids
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--src-dir", default=SRC_DIR, help="downloaded card images (<set>/<id>.jpg)")
+    parser.add_argument("--out-dir", default=OUT_DIR, help="where derivatives are written")
+    parser.add_argument(
+        "--widths",
+        type=lambda s: tuple(int(w) for w in s.split(",")),
+        default=DEFAULT_WIDTHS,
+        help="comma-separated thumbnail widths in px (default %s)" % ",".join(map(str, DEFAULT_WIDTHS)),
+    )
+    parser.add_argument(
+        "--sprite-width",
+        type=int,
+        default=DEFAULT_SPRITE_WIDTH,
+        help=f"card width in px on the per-set sprite sheets (default {DEFAULT_SPRITE_WIDTH})",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--only", help="build just this one set id")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Pillow not installed - nothing to build. Install with: pip install pillow")
+        sys.exit(1)
+
+    formats = ["webp"]
+    if avif_supported():
+        formats.append("avif")
+    else:
+        print("This Pillow build can't write AVIF - skipping AVIF variants (pip install pillow-avif-plugin).\n")
+
+    sources = scan_sources(args.src_dir)
+    if args.only:
+        if args.only not in sources:
+            print(f"No images found for set {args.only} in {args.src_dir}")
+            sys.exit(1)
+        sources = {args.only: sources[args.only]}
+
+    manifest_path = os.path.join(args.out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not args.force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    # Changing the widths or formats invalidates every output, not just some.
+    settings = {"widths": list(args.widths), "formats": formats, "sprite_width": args.sprite_width}
+    if manifest.get("settings") != settings:
+        manifest = {"settings": settings, "images": {}}
+    images = manifest["images"]
+
+    stale, dirty_sets = [], set()
+    for set_id, card_ids in sources.items():
+        os.makedirs(os.path.join(args.out_dir, set_id), exist_ok=True)
+        for card_id in card_ids:
+            key = f"{set_id}/{card_id}"
+            digest = sha256_file(os.path.join(args.src_dir, set_id, f"{card_id}.jpg"))
+            outputs = derivative_paths(args.out_dir, set_id, card_id, args.widths, formats)
+            if images.get(key) == digest and all(os.path.exists(p) for p in outputs):
+                continue
+            stale.append((key, digest, set_id, card_id))
+            dirty_sets.add(set_id)
+        if not os.path.exists(os.path.join(args.out_dir, set_id, f"sprite.{args.sprite_width}.json")):
+            dirty_sets.add(set_id)
+
+    # Cards (or whole sets) whose source image is gone: drop them from the
+    # manifest, redraw the sheet without them and prune their files below.
+    in_scope = set(sources) if args.only else None
+    removed_cards = 0
+    for key in list(images):
+        set_id, card_id = key.split("/", 1)
+        if in_scope is not None and set_id not in in_scope:
+            continue
+        if card_id not in sources.get(set_id, ()):
+            del images[key]
+            removed_cards += 1
+            if set_id in sources:
+                dirty_sets.add(set_id)
+    pruned = 0
+    for set_id in sources:
+        expected = {f"sprite.{args.sprite_width}.webp", f"sprite.{args.sprite_width}.json"}
+        for card_id in sources[set_id]:
+            expected.update(os.path.basename(p) for p in derivative_paths(
+                args.out_dir, set_id, card_id, args.widths, formats))
+        pruned += prune_outputs(args.out_dir, set_id, expected)
+    if in_scope is None and os.path.isdir(args.out_dir):
+        for set_id in os.listdir(args.out_dir):
+            set_dir = os.path.join(args.out_dir, set_id)
+            if os.path.isdir(set_dir) and set_id not in sources:
+                pruned += prune_outputs(args.out_dir, set_id, set())
+                os.rmdir(set_dir)
+
+    print(f"{sum(len(v) for v in sources.values())} source images, {len(stale)} to (re)build, "
+          f"{len(dirty_sets)} set sprite sheet(s) to redraw")
+    if removed_cards or pruned:
+        print(f"{removed_cards} card(s) no longer have a source image; pruned {pruned} stale file(s)")
+
+    failed = sprite_failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(
+                build_derivatives,
+                os.path.join(args.src_dir, set_id, f"{card_id}.jpg"),
+                args.out_dir, set_id, card_id, args.widths, formats,
+            ): (key, digest)
+            for key, digest, set_id, card_id in stale
+        }
+        sprite_futures = [
+            pool.submit(build_sprite, args.src_dir, args.out_dir, set_id, sources[set_id], args.sprite_width)
+            for set_id in sorted(dirty_sets)
+        ]
+        for fut, (key, digest) in futures.items():
+            try:
+                fut.result()
+                images[key] = digest
+            except Exception as e:
+                print(f"  FAILED {key}: {e}")
+                images.pop(key, None)
+                failed += 1
+        for fut in sprite_futures:
+            try:
+                set_id, w = fut.result()
+                print(f"  sprite sheet: {set_id} @ {w}px")
+            except Exception as e:
+                print(f"  sprite sheet FAILED: {e}")
+                sprite_failed += 1
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+    # What the page needs to build its srcsets - kept out of the manifest so
+    # it doesn't fetch every source hash.
+    with open(os.path.join(args.out_dir, PAGE_INDEX_NAME), "w", encoding="utf-8") as f:
+        built = sorted(
+            d for d in os.listdir(args.out_dir)
+            if os.path.exists(os.path.join(args.out_dir, d, f"sprite.{args.sprite_width}.json"))
+        )
+        json.dump({**settings, "sets": built}, f, indent=1)
+        f.write("\n")
+
+    print(f"Done. {len(stale) - failed} image(s) rebuilt, {failed + sprite_failed} failure(s).")
+    if failed or sprite_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
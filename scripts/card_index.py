@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""card_index.py - compiles kingdom/data/dominion_cards.json into a bitset
+index, and answers card filters against it with bitwise ops instead of
+looping over every card dict.
+
+Every card (from every group: cards, events, projects, othercards, ...) gets
+a fixed position. The index then holds one bitset per:
+
+- boolean tag that is true for the card (isAction, isAttack, isTrashing, ...)
+- set id (adventures, baseset2, ...)
+- group (cards, events, projects, ...)
+- treasure cost (cost:0 .. cost:11), plus potion and debt costs
+
+so "owned-set Action Attacks costing 2-4" is a handful of ANDs/ORs over
+ints, whatever the card count. In Python:
+
+    from card_index import CardIndex
+    idx = CardIndex.load()
+    idx.query(tags=["isAction", "isAttack"], sets=["baseset2"], cost_max=4)
+
+Run as a script to (re)build the exported index the kingdom page can load:
+
+    python scripts/card_index.py
+
+which writes kingdom/data/card_index.json. There each bitset is a list of
+32-bit words (bit i of word w is card w*32+i), so the front end can combine
+them with plain JS bitwise ops and only touch the cards whose bits survive.
+"""
+import argparse
+import json
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+KINGDOM_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "kingdom", "data")
+CARDS_PATH = os.path.join(KINGDOM_DATA_DIR, "dominion_cards.json")
+INDEX_PATH = os.path.join(KINGDOM_DATA_DIR, "card_index.json")
+
+INDEX_VERSION = 1
+WORD_BITS = 32
+
+
+def card_cost_value(card):
+    """Same ordering value the kingdom page sorts by (kingdom.js cardCostValue)."""
+    cost = card.get("cost") or {}
+    return (cost.get("treasure") or 0) + (cost.get("debt") or 0) + (cost.get("potion") or 0) * 10
+
+
+def iter_cards(data):
+    """(set_id, group, card) for every card-like entry, in file order."""
+    for set_id, set_data in data.items():
+        for group, entries in set_data.items():
+            if not isinstance(entries, list):
+                continue
+            for card in entries:
+                if isinstance(card, dict) and "id" in card:
+                    yield set_id, group, card
+
+
+def _to_words(bits, n):
+    mask = (1 << WORD_BITS) - 1
+    return [(bits >> (w * WORD_BITS)) & mask for w in range((n + WORD_BITS - 1) // WORD_BITS)]
+
+
+def _from_words(words):
+    bits = 0
+    for w, word in enumerate(words):
+        bits |= word << (w * WORD_BITS)
+    return bits
+
+
+class CardIndex:
+    """Bitset index over a fixed card ordering. Bitsets are plain Python ints
+    (bit i = card i)."""
+
+    def __init__(self, cards, tags, sets, groups, costs, potion, debt):
+        self.cards = cards  # position -> card dict (with setId and group)
+        self.tags = tags  # tag name -> bitset
+        self.sets = sets  # set id -> bitset
+        self.groups = groups  # group name -> bitset
+        self.costs = costs  # treasure cost (int) -> bitset
+        self.potion = potion  # bitset of cards with a potion cost
+        self.debt = debt  # bitset of cards with a debt cost
+        self.all = (1 << len(cards)) - 1
+        # A few ids repeat across groups (e.g. a card and its same-named event);
+        # by_id points at the first.
+        self.by_id = {}
+        for i, c in enumerate(cards):
+            self.by_id.setdefault(c["id"], i)
+
+    @classmethod
+    def build(cls, data):
+        cards = []
+        tags, sets, groups, costs = {}, {}, {}, {}
+        potion = debt = 0
+        for i, (set_id, group, card) in enumerate(iter_cards(data)):
+            bit = 1 << i
+            cards.append({**card, "setId": set_id, "group": group})
+            sets[set_id] = sets.get(set_id, 0) | bit
+            groups[group] = groups.get(group, 0) | bit
+            for key, value in card.items():
+                if value is True:
+                    tags[key] = tags.get(key, 0) | bit
+            cost = card.get("cost")
+            if cost is not None:
+                t = cost.get("treasure") or 0
+                costs[t] = costs.get(t, 0) | bit
+                if cost.get("potion"):
+                    potion |= bit
+                if cost.get("debt"):
+                    debt |= bit
+        return cls(cards, tags, sets, groups, costs, potion, debt)
+
+    @classmethod
+    def load(cls, cards_path=CARDS_PATH):
+        with open(cards_path, "r", encoding="utf-8") as f:
+            return cls.build(json.load(f))
+
+    def mask(self, tags=(), exclude=(), sets=None, groups=None, cost_min=None, cost_max=None,
+             potion=None, debt=None, ids_excluded=()):
+        """Bitset of cards matching every condition given:
+
+        tags: all of these tags are true; exclude: none of these are true;
+        sets/groups: in any of these; cost_min/cost_max: treasure cost range
+        (inclusive; cards with no cost at all only match when both are None);
+        potion/debt: True/False to require/forbid that cost component;
+        ids_excluded: card ids to drop (e.g. a blacklist).
+        """
+        bits = self.all
+        for t in tags:
+            bits &= self.tags.get(t, 0)
+        for t in exclude:
+            bits &= ~self.tags.get(t, 0)
+        if sets is not None:
+            bits &= self._union(self.sets, sets)
+        if groups is not None:
+            bits &= self._union(self.groups, groups)
+        if cost_min is not None or cost_max is not None:
+            lo = cost_min if cost_min is not None else float("-inf")
+            hi = cost_max if cost_max is not None else float("inf")
+            bits &= self._union(self.costs, [c for c in self.costs if lo <= c <= hi])
+        if potion is not None:
+            bits &= self.potion if potion else ~self.potion
+        if debt is not None:
+            bits &= self.debt if debt else ~self.debt
+        for card_id in ids_excluded:
+            i = self.by_id.get(card_id)
+            if i is not None:
+                bits &= ~(1 << i)
+        return bits & self.all
+
+    def query(self, **conditions):
+        """Cards matching mask(**conditions), in index order."""
+        return [self.cards[i] for i in self.positions(self.mask(**conditions))]
+
+    def count(self, **conditions):
+        return self.mask(**conditions).bit_count()
+
+    @staticmethod
+    def positions(bits):
+        """Set bit positions of a bitset, lowest first, skipping zero runs."""
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(low.bit_length() - 1)
+            bits ^= low
+        return out
+
+    @staticmethod
+    def _union(table, keys):
+        bits = 0
+        for k in keys:
+            bits |= table.get(k, 0)
+        return bits
+
+    def to_json(self):
+        n = len(self.cards)
+        return {
+            "version": INDEX_VERSION,
+            "wordBits": WORD_BITS,
+            "count": n,
+            "ids": [c["id"] for c in self.cards],
+            "costValue": [card_cost_value(c) for c in self.cards],
+            "tags": {k: _to_words(v, n) for k, v in sorted(self.tags.items())},
+            "sets": {k: _to_words(v, n) for k, v in sorted(self.sets.items())},
+            "groups": {k: _to_words(v, n) for k, v in sorted(self.groups.items())},
+            "cost": {str(k): _to_words(v, n) for k, v in sorted(self.costs.items())},
+            "potion": _to_words(self.potion, n),
+            "debt": _to_words(self.debt, n),
+        }
+
+    @classmethod
+    def from_json(cls, index, data):
+        """Rebuild from an exported index plus the card data it was built from
+        (the export only carries ids, not full card dicts)."""
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"card index version {index.get('version')} != {INDEX_VERSION}; rebuild it")
+        cards = [{**card, "setId": set_id, "group": group} for set_id, group, card in iter_cards(data)]
+        if [c["id"] for c in cards] != index["ids"]:
+            raise ValueError("card index is stale (card data changed since it was built); rebuild it")
+        return cls(
+            cards,
+            {k: _from_words(v) for k, v in index["tags"].items()},
+            {k: _from_words(v) for k, v in index["sets"].items()},
+            {k: _from_words(v) for k, v in index["groups"].items()},
+            {int(k): _from_words(v) for k, v in index["cost"].items()},
+            _from_words(index["potion"]),
+            _from_words(index["debt"]),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", default=CARDS_PATH, help="dominion_cards.json to index")
+    parser.add_argument("--out", default=INDEX_PATH, help="where to write the exported index")
+    args = parser.parse_args()
+
+    idx = CardIndex.load(args.cards)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(idx.to_json(), f, separators=(",", ":"))
+        f.write("\n")
+
+    print(f"Indexed {len(idx.cards)} cards: {len(idx.tags)} tags, {len(idx.sets)} sets, "
+          f"{len(idx.groups)} groups, {len(idx.costs)} cost buckets -> {args.out}")
+    print(f"  kingdom cards: {idx.count(groups=['cards'])}, "
+          f"villages: {idx.count(groups=['cards'], tags=['isActionSupplier'])}, "
+          f"trashers: {idx.count(groups=['cards'], tags=['isTrashing'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,54 @@
-import os
-import json
-import requests
+#!/usr/bin/env python3
+"""download_dominion_imgs.py - fetches the card art for every enabled set in
+kingdom/data/mysets.json into kingdom/data/dominion_card_imgs/<set>/<id>.jpg.
 
-BASE = "https://dominionrandomizer.com/img/cards"
-OUT_DIR = "kingdom\data\dominion_card_imgs"
+    python scripts/download_dominion_imgs.py
 
-# always resolve relative to script dir
-script_dir = os.path.dirname(os.path.abspath(__file__))
+Needs:
 
-with open(os.path.join(script_dir, "kingdom\data\dominion_cards.json"), "r", encoding="utf-8") as f:
-    all_cards = json.load(f)
+    pip install requests
 
-with open(os.path.join(script_dir, "kingdom\data\mysets.json"), "r", encoding="utf-8") as f:
-    expansions = json.load(f)
+Downloads run on a small thread pool sharing one pooled requests.Session.
+Each file is written to a temp file next to its target and renamed into place
+only once the whole body has arrived (and matches Content-Length), so an
+interrupted run can never leave a truncated .jpg behind that looks finished.
 
-os.makedirs(OUT_DIR, exist_ok=True)
+A manifest (dominion_card_imgs/manifest.json) records each image's ETag, size
+and sha256. On re-runs, files whose on-disk size/hash still match the
+manifest are re-requested conditionally (If-None-Match) and a 304 skips them;
+where the server sent no ETag there's nothing to revalidate against, so a
+file whose size and sha256 both match is skipped without a request. Anything
+missing, truncated or edited locally is fetched again. Use --verify to re-hash
+every file instead of trusting size alone, and --force to ignore the manifest
+entirely (the only way to pick up a changed image that came without an ETag).
+
+An image already on disk with no manifest entry yet - every committed image,
+the first time this runs - is recorded as it is (no ETag) rather than fetched
+again, as the script always skipped existing files; --force refreshes them.
+
+Point --base-url at a local stand-in (e.g. `python -m http.server` serving a
+directory laid out as <set>/<id>.jpg) to exercise this without the real site.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = "https://dominionrandomizer.com/img/cards"
+USER_AGENT = "MySite-KingdomRandomizer/1.0 (personal hobby project; card image refresh)"
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+KINGDOM_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "kingdom", "data")
+OUT_DIR = os.path.join(KINGDOM_DATA_DIR, "dominion_card_imgs")
+MANIFEST_NAME = "manifest.json"
 
-def download_file(url, path):
-    if os.path.exists(path):
-        return
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(r.content)
-        print("Downloaded:", path)
-    except Exception as e:
-        print("Failed:", url, e)
 
 # recursively collect all "id" values from a nested dict/list
 def collect_ids(obj, ids):
@@ -40,27 +62,168 @@ def collect_ids(obj, ids):
         for item in obj:
             collect_ids(item, ids)
 
-for set_id, enabled in expansions.items():
-    if not enabled:
-        continue
-    if set_id not in all_cards:
-        print(f"Warning: {set_id} not found in cards.json")
-        continue
 
-    set_data = all_cards[set_id]
-    set_name = set_data.get("name", set_id)
-    print(f"Processing expansion: {set_name} ({set_id})")
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_session(workers):
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    # One connection per worker, reused across every file that worker fetches.
+    retry = Retry(total=3, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    write_atomic(path, (json.dumps(manifest, indent=1, sort_keys=True) + "\n").encode("utf-8"))
+
+
+def write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def local_copy_ok(path, entry, verify):
+    """Whether the file on disk is the complete file the manifest describes."""
+    if not entry or not os.path.exists(path):
+        return False
+    if os.path.getsize(path) != entry.get("size"):
+        return False
+    return not verify or sha256_file(path) == entry.get("sha256")
+
+
+def local_entry(path):
+    """A manifest entry for a file already on disk, with no ETag to go by."""
+    return {"etag": None, "size": os.path.getsize(path), "sha256": sha256_file(path)}
+
+
+def download_file(session, url, path, entry, verify=False, force=False, timeout=20):
+    """Fetch one image. Returns (status, new_manifest_entry) where status is
+    "downloaded", "unchanged" or "failed"."""
+    headers = {}
+    if not force:
+        if entry is None and os.path.exists(path) and os.path.getsize(path) > 0:
+            return "unchanged", local_entry(path)
+        # Without an ETag a request can't be conditional - check the hash too
+        # and skip the request altogether.
+        etag = entry.get("etag") if entry else None
+        if local_copy_ok(path, entry, verify or not etag):
+            if not etag:
+                return "unchanged", entry
+            headers["If-None-Match"] = etag
+    try:
+        r = session.get(url, headers=headers, timeout=timeout)
+        if r.status_code == 304:
+            return "unchanged", entry
+        r.raise_for_status()
+        body = r.content
+        expected = r.headers.get("Content-Length")
+        # requests transparently decodes gzip bodies, in which case the header
+        # describes the encoded size, not ours.
+        if expected is not None and not r.headers.get("Content-Encoding") and int(expected) != len(body):
+            raise IOError(f"truncated body ({len(body)} of {expected} bytes)")
+    except Exception as e:
+        print("Failed:", url, e)
+        return "failed", entry
+
+    write_atomic(path, body)
+    return "downloaded", {
+        "etag": r.headers.get("ETag"),
+        "size": len(body),
+        "sha256": hashlib.sha256(body).hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL, help=f"image server root (default {BASE_URL})")
+    parser.add_argument("--out-dir", default=OUT_DIR, help="where <set>/<id>.jpg files are written")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads (default 8)")
+    parser.add_argument("--only", help="download just this one set id")
+    parser.add_argument("--verify", action="store_true", help="re-hash local files instead of trusting their size")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-download everything")
+    args = parser.parse_args()
+
+    with open(os.path.join(KINGDOM_DATA_DIR, "dominion_cards.json"), "r", encoding="utf-8") as f:
+        all_cards = json.load(f)
+    with open(os.path.join(KINGDOM_DATA_DIR, "mysets.json"), "r", encoding="utf-8") as f:
+        expansions = json.load(f)
+
+    if args.only:
+        if args.only not in all_cards:
+            print(f"Unknown set id: {args.only}")
+            sys.exit(1)
+        expansions = {args.only: True}
+
+    base_url = args.base_url.rstrip("/")
+    os.makedirs(args.out_dir, exist_ok=True)
+    manifest_path = os.path.join(args.out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    jobs = []
+    for set_id, enabled in expansions.items():
+        if not enabled:
+            continue
+        if set_id not in all_cards:
+            print(f"Warning: {set_id} not found in dominion_cards.json")
+            continue
+
+        set_data = all_cards[set_id]
+        print(f"Queueing expansion: {set_data.get('name', set_id)} ({set_id})")
+
+        ids = set()
+        collect_ids(set_data, ids)
+        save_dir = os.path.join(args.out_dir, set_id)
+        os.makedirs(save_dir, exist_ok=True)
+        for item_id in sorted(ids):
+            key = f"{set_id}/{item_id}.jpg"
+            jobs.append((key, f"{base_url}/{key}", os.path.join(save_dir, f"{item_id}.jpg")))
 
-    ids = set()
-    collect_ids(set_data, ids)
+    counts = {"downloaded": 0, "unchanged": 0, "failed": 0}
+    session = make_session(args.workers)
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(download_file, session, url, path, manifest.get(key), args.verify, args.force): (key, path)
+            for key, url, path in jobs
+        }
+        for fut in as_completed(futures):
+            key, path = futures[fut]
+            status, entry = fut.result()
+            counts[status] += 1
+            if entry:
+                manifest[key] = entry
+            if status == "downloaded":
+                print("Downloaded:", os.path.relpath(path, args.out_dir))
 
-    save_dir = os.path.join(OUT_DIR, set_id)
-    os.makedirs(save_dir, exist_ok=True)
+    save_manifest(manifest_path, manifest)
+    print(
+        f"All done! {counts['downloaded']} downloaded, {counts['unchanged']} unchanged, "
+        f"{counts['failed']} failed (of {len(jobs)})."
+    )
+    if counts["failed"]:
+        sys.exit(1)
 
-    for item_id in ids:
-        filename = f"{item_id}.jpg"
-        url = f"{BASE}/{set_id}/{filename}"
-        save_path = os.path.join(save_dir, filename)
-        download_file(url, save_path)
 
-print("All done!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""fetch_standin.py - offline stand-ins for the two sources
+fetch_store_locations.py reads, so full multi-chain runs can be benchmarked
+and tuned (retry backoff, concurrency, caching) reproducibly on one machine
+with no network access.
+
+Overpass: a local HTTP server that answers POSTs the way the real
+/api/interpreter does, from captured responses keyed by the sha256 of the
+query body. It can inject latency and 429/504 errors at configurable rates:
+
+    # capture real responses once (needs network), proxying through:
+    python scripts/fetch_standin.py serve --record --captures captures/
+    # ...or synthesize captures from the checked-in stores/data/*.json:
+    python scripts/fetch_standin.py synth-captures --captures captures/
+
+    # then replay, with some realistic misbehavior:
+    python scripts/fetch_standin.py serve --captures captures/ \\
+        --latency-ms 400 --jitter-ms 200 --p429 0.1 --p504 0.05 --seed 1
+
+    python scripts/fetch_store_locations.py --overpass-url http://127.0.0.1:8765/api/interpreter \\
+        --overture-parquet fixtures/overture.parquet --delay 0
+
+With --synth the server instead answers any nationwide or bbox query for the
+configured chains straight from stores/data (needed for --sharded runs, whose
+tile queries vary), and --timeout-over N makes answers bigger than N nodes
+come back as an Overpass timeout, to exercise adaptive tile splitting.
+
+GET /stats on the server returns request/injection counters as JSON.
+
+Overture: a small local Parquet file with the same columns
+fetch_overture_chain() selects from the real release, built from the
+Overture-sourced records already in stores/data (needs `pip install duckdb`):
+
+    python scripts/fetch_standin.py overture-fixture --out fixtures/overture.parquet
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chain_config import CHAINS
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORES_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "stores", "data")
+UPSTREAM_OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+
+def query_key(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def capture_path(captures_dir, key):
+    return os.path.join(captures_dir, f"{key}.json")
+
+
+def load_store_records(slug):
+    path = os.path.join(STORES_DATA_DIR, f"{slug}.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# Overpass stand-in server
+# ---------------------------------------------------------------------------
+# Just enough of Overpass QL to answer what build_overpass_query() emits.
+_CLAUSE_RE = re.compile(r'node\["(?:brand|name)"="((?:[^"\\]|\\.)*)"\]\(area\.usa\)(?:\(([^)]*)\))?')
+_LIMIT_RE = re.compile(r"out body (\d+);")
+
+
+class SynthOverpass:
+    """Answers any nationwide or bbox query for the configured chains
+    straight from stores/data, instead of from exact-match captures - so
+    sharded runs (whose tile queries were never captured) work offline too."""
+
+    def __init__(self, timeout_over=0):
+        self.timeout_over = timeout_over
+        self.by_name = {}
+        node_id = 1
+        for slug, chain in CHAINS.items():
+            elements = synth_elements(slug, chain, node_id)
+            node_id += len(elements)
+            for name in chain["osm_names"]:
+                self.by_name[name] = elements
+
+    def answer(self, query):
+        clauses = _CLAUSE_RE.findall(query)
+        if not clauses:
+            return None
+        seen, elements = set(), []
+        for name, scope in clauses:
+            bbox = tuple(float(x) for x in scope.split(",")) if scope else None
+            for el in self.by_name.get(name.replace('\\"', '"'), []):
+                if el["id"] in seen:
+                    continue
+                if bbox and not (bbox[0] <= el["lat"] <= bbox[2] and bbox[1] <= el["lon"] <= bbox[3]):
+                    continue
+                seen.add(el["id"])
+                elements.append(el)
+        result = {"version": 0.6, "generator": "fetch_standin synth", "elements": elements}
+        # Mimic Overpass running out of time on a big area: partial results
+        # plus a runtime-error remark, still with HTTP 200.
+        if self.timeout_over and len(elements) > self.timeout_over:
+            result["elements"] = elements[: self.timeout_over]
+            result["remark"] = 'runtime error: Query timed out in "query" at line 3 after 90 seconds.'
+            return result
+        m = _LIMIT_RE.search(query)
+        if m:
+            result["elements"] = elements[: int(m.group(1))]
+        return result
+
+
+class StandinState:
+    def __init__(self, args):
+        self.args = args
+        self.synth = SynthOverpass(args.timeout_over) if args.synth else None
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "recorded": 0, "missing": 0, "injected_429": 0,
+                      "injected_504": 0}
+
+    def roll(self):
+        """Decide this request's fate and delay under one lock, so a seeded
+        run injects the same faults in the same order every time."""
+        with self.lock:
+            self.stats["requests"] += 1
+            r = self.rng.random()
+            delay = max(0.0, self.args.latency_ms + self.rng.uniform(-1, 1) * self.args.jitter_ms) / 1000
+        if r < self.args.p429:
+            return 429, delay
+        if r < self.args.p429 + self.args.p504:
+            return 504, delay
+        return 200, delay
+
+    def bump(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class OverpassStandinHandler(BaseHTTPRequestHandler):
+    server_version = "OverpassStandin/1.0"
+
+    def log_message(self, fmt, *args):
+        if not self.server.state.args.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if status in (200, 404) else "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.state.lock:
+                body = json.dumps(self.server.state.stats, indent=1).encode("utf-8")
+            self._send(200, body)
+        else:
+            self._send(404, b'{"error": "POST queries to /api/interpreter; GET /stats for counters"}')
+
+    def do_POST(self):
+        state = self.server.state
+        args = state.args
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, delay = state.roll()
+        time.sleep(delay)
+
+        if status == 429:
+            state.bump("injected_429")
+            self._send(429, b"rate_limited", [("Retry-After", str(args.retry_after))])
+            return
+        if status == 504:
+            state.bump("injected_504")
+            self._send(504, b"gateway timeout")
+            return
+
+        if state.synth is not None:
+            result = state.synth.answer(body.decode("utf-8"))
+            if result is not None:
+                state.bump("served")
+                self._send(200, json.dumps(result).encode("utf-8"))
+                return
+
+        path = capture_path(args.captures, query_key(body))
+        if args.record and not os.path.exists(path):
+            req = urllib.request.Request(
+                args.upstream, data=body, method="POST",
+                headers={"User-Agent": self.headers.get("User-Agent", "fetch_standin"),
+                         "Content-Type": "application/x-www-form-urlencoded"},
+            )
+            try:
+                with urllib.request.urlopen(req, timeout=200) as resp:
+                    payload = resp.read()
+            except urllib.error.HTTPError as e:
+                # Pass upstream errors straight through, but don't capture them.
+                self._send(e.code, e.read() or b"", [(k, v) for k, v in e.headers.items() if k == "Retry-After"])
+                return
+            tmp = path + ".part"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+            state.bump("recorded")
+
+        if not os.path.exists(path):
+            state.bump("missing")
+            self._send(404, b'{"error": "no captured response for this query"}')
+            return
+        with open(path, "rb") as f:
+            payload = f.read()
+        state.bump("served")
+        self._send(200, payload)
+
+
+def cmd_serve(args):
+    os.makedirs(args.captures, exist_ok=True)
+    server = ThreadingHTTPServer((args.host, args.port), OverpassStandinHandler)
+    server.state = StandinState(args)
+    n = len(glob.glob(os.path.join(args.captures, "*.json")))
+    print(f"Overpass stand-in on http://{args.host}:{args.port}/api/interpreter "
+          f"({'recording via ' + args.upstream if args.record else 'replay only'}, {n} captured responses)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.state.stats))
+
+
+# ---------------------------------------------------------------------------
+# Fixtures from checked-in data
+# ---------------------------------------------------------------------------
+def record_sources(r):
+    # Files from before the Overture merge carry no `sources` field - those
+    # were OSM-only.
+    return r.get("sources", ["osm"])
+
+
+def synth_elements(slug, chain, first_id=1):
+    """Overpass node elements rebuilt from a chain's OSM-sourced records in
+    stores/data."""
+    elements = []
+    for r in load_store_records(slug):
+        if "osm" not in record_sources(r):
+            continue
+        number, _, street = (r.get("address") or "").partition(" ")
+        tags = {"brand": chain["display"], "name": r.get("name") or chain["display"]}
+        if street:
+            tags.update({"addr:housenumber": number, "addr:street": street})
+        for key, field in (("addr:city", "city"), ("addr:state", "state")):
+            if r.get(field):
+                tags[key] = r[field]
+        elements.append({"type": "node", "id": first_id + len(elements), "lat": r["lat"], "lon": r["lon"], "tags": tags})
+    return elements
+
+
+def cmd_synth_captures(args):
+    """Overpass-shaped responses for the nationwide per-chain queries, keyed
+    exactly as fetch_store_locations.py will send them."""
+    from fetch_store_locations import build_overpass_query
+
+    os.makedirs(args.captures, exist_ok=True)
+    node_id = 1
+    for slug, chain in CHAINS.items():
+        elements = synth_elements(slug, chain, node_id)
+        node_id += len(elements)
+        body = build_overpass_query(chain["osm_names"]).encode("utf-8")
+        with open(capture_path(args.captures, query_key(body)), "w", encoding="utf-8") as f:
+            json.dump({"version": 0.6, "generator": "fetch_standin synth", "elements": elements}, f)
+        print(f"  {slug}: {len(elements)} nodes")
+
+
+def cmd_overture_fixture(args):
+    try:
+        import duckdb
+    except ImportError:
+        print("duckdb not installed - can't write Parquet. Install with: pip install duckdb")
+        sys.exit(1)
+
+    rows = []
+    for slug, chain in CHAINS.items():
+        records = load_store_records(slug)
+        picked = [r for r in records if "overture" in record_sources(r)]
+        # A chain with no Overture-sourced records yet still gets a fixture:
+        # its OSM points, nudged ~20m north so the dedup step has realistic
+        # cross-source near-duplicates to merge.
+        nudge = 0.0 if picked else 0.0002
+        for r in picked or records:
+            rows.append((r.get("name") or chain["display"], r["lon"], r["lat"] + nudge, r.get("address") or None,
+                         r.get("city") or None, r.get("state") or None, chain["overture_brand"]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    con = duckdb.connect()
+    con.execute("INSTALL spatial; LOAD spatial;")
+    con.execute("CREATE TABLE raw (name VARCHAR, lon DOUBLE, lat DOUBLE, address VARCHAR, city VARCHAR, "
+                "state VARCHAR, brand VARCHAR)")
+    con.executemany("INSERT INTO raw VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    # Same nested column shapes as the Overture places theme, as far as
+    # fetch_overture_chain() reads them.
+    out = args.out.replace("'", "''")
+    con.execute(f"""
+        COPY (
+            SELECT
+                {{'primary': name}} AS names,
+                ST_Point(lon, lat) AS geometry,
+                [{{'freeform': address, 'locality': city, 'region': state}}] AS addresses,
+                {{'names': {{'primary': brand}}}} AS brand,
+                0.9 AS confidence,
+                'open' AS operating_status,
+                {{'xmin': lon, 'xmax': lon, 'ymin': lat, 'ymax': lat}} AS bbox
+            FROM raw
+        ) TO '{out}' (FORMAT parquet)
+    """)
+    print(f"Wrote {len(rows)} places to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run the Overpass stand-in server")
+    serve.add_argument("--captures", default="captures", help="directory of captured responses")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--record", action="store_true", help="proxy uncaptured queries upstream and save them")
+    serve.add_argument("--upstream", default=UPSTREAM_OVERPASS_URL, help="real endpoint used by --record")
+    serve.add_argument("--latency-ms", type=float, default=0.0, help="added delay per request")
+    serve.add_argument("--jitter-ms", type=float, default=0.0, help="+/- uniform jitter on the delay")
+    serve.add_argument("--p429", type=float, default=0.0, help="fraction of requests answered 429")
+    serve.add_argument("--p504", type=float, default=0.0, help="fraction of requests answered 504")
+    serve.add_argument("--retry-after", type=int, default=2, help="Retry-After seconds sent with 429s")
+    serve.add_argument("--seed", type=int, help="seed for reproducible latency/fault injection")
+    serve.add_argument("--quiet", action="store_true", help="don't log each request")
+    serve.add_argument("--synth", action="store_true",
+                       help="answer any nationwide/bbox chain query from stores/data instead of captures")
+    serve.add_argument("--timeout-over", type=int, default=0,
+                       help="with --synth, simulate an Overpass timeout for answers over N nodes")
+    serve.set_defaults(func=cmd_serve)
+
+    synth = sub.add_parser("synth-captures", help="build Overpass captures from stores/data")
+    synth.add_argument("--captures", default="captures", help="directory to write captured responses to")
+    synth.set_defaults(func=cmd_synth_captures)
+
+    fixture = sub.add_parser("overture-fixture", help="build a local Overture Parquet fixture from stores/data")
+    fixture.add_argument("--out", default=os.path.join("fixtures", "overture.parquet"))
+    fixture.set_defaults(func=cmd_overture_fixture)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,8 +27,36 @@ OSM-only explicitly with --osm-only.
 Optional: fetch just one chain while testing:
 
     python scripts/fetch_store_locations.py --only walmart
+
+Big chains: --sharded splits the OSM query into bbox tiles (split further
+when a tile times out or comes back too big), so one slow region can't fail
+the whole chain - add --shard-cache DIR to make a rerun re-query only the
+tiles that failed (a chain's cache is cleared once it has no failed tiles, so
+the next refresh starts fresh):
+
+    python scripts/fetch_store_locations.py --sharded --shard-cache .shard-cache
+
+OSM queries go through a pool of public Overpass endpoints (OVERPASS_URLS),
+hedged and failed over between them - see overpass_pool.py. Per-endpoint
+stats are printed with the run summary.
+
+--fill-places fills in city/state that neither source had, from local Census
+boundary files (see reverse_geocode.py).
+
+--dedup-workers N spreads the merge/dedup step of very large chains over N
+processes (same output as the single-process pass; see geo_utils.py).
+
+Each run ends by republishing stores/data (minified, content-hashed copies
+the map page loads - see publish_data.py). A chain whose OSM or Overture
+fetch failed (or lost shard tiles) still gets its file written from what
+did come back, but the run exits with status 1 so callers such as build.py
+don't record it as a good build.
+
+Offline: --overpass-url and --overture-parquet point the two sources at local
+stand-ins instead (see fetch_standin.py), for reproducible benchmark runs.
 """
 import argparse
+import hashlib
 import json
 import os
 import re
@@ -36,67 +64,113 @@ import sys
 import time
 import urllib.error
 import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from chain_config import CHAINS, US_BOUNDS
-from geo_utils import dedupe_nearby
+from geo_utils import dedupe_nearby, dedupe_nearby_parallel
+from overpass_pool import EndpointPool, NoEndpointAvailable
+from publish_data import load_brotli, publish_dir
+from record_store import SOURCE_BITS, RecordStore
+from reverse_geocode import PLACES_PATH, STATES_PATH, ReverseGeocoder, fill_missing
+
+# Public Overpass instances (https://wiki.openstreetmap.org/wiki/Overpass_API#Public_Overpass_API_instances)
+# serving the same worldwide data - queries go to the healthiest, and are
+# hedged/failed over to the others (see overpass_pool.py).
+OVERPASS_URLS = [
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.kumi.systems/api/interpreter",
+]
+# Below this many records a process pool costs more to start than it saves
+# (at 20k: ~1.3x faster than dedupe_nearby on 2-4 workers, ~2x at 65k+).
+PARALLEL_DEDUP_MIN = 20000
 
-OVERPASS_URL = "https://overpass-api.de/api/interpreter"
 USER_AGENT = "MySite-ChainStoreMap/1.0 (personal hobby project; static site data refresh)"
 
 # Overture publishes a new dated release roughly monthly - if this one 404s,
 # check https://docs.overturemaps.org/release/latest/ for the current one.
 OVERTURE_RELEASE = "2026-06-17.0"
 OVERTURE_MIN_CONFIDENCE = 0.6
+OVERTURE_SOURCE = f"s3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}/theme=places/type=place/*"
+
+# Base cooldowns (seconds, growing with consecutive failures) for an Overpass
+# endpoint after a 429-without-Retry-After/504, or a network error - scaled by
+# --backoff-scale when tuning against a stand-in.
+RATE_LIMIT_BACKOFF = 15
+NETWORK_BACKOFF = 10
+# 429s don't count against a query's retries - being rate limited says
+# nothing about the query - but give up after this many in a row.
+RATE_LIMIT_RETRIES = 8
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, "..", "stores", "data")
 
+# Rebuilt in main() from the command line.
+OVERPASS_POOL = EndpointPool(OVERPASS_URLS, USER_AGENT, RATE_LIMIT_BACKOFF, NETWORK_BACKOFF)
+
 
 # ---------------------------------------------------------------------------
 # Source 1: OpenStreetMap via Overpass
 # ---------------------------------------------------------------------------
-def build_overpass_query(names):
+def build_overpass_query(names, bbox=None, timeout=180, limit=None):
+    """Nationwide query by default. With bbox=(south, west, north, east) it
+    covers just the part of that tile inside the US (used by sharded mode -
+    US_BOUNDS tiles reach well into Canada and Mexico), and `limit` caps how
+    many nodes come back - hitting the cap means the tile needs splitting."""
+    scope = "(area.usa)" + ("" if bbox is None else "({:.6f},{:.6f},{:.6f},{:.6f})".format(*bbox))
     clauses = []
     for n in names:
         esc = n.replace('"', '\\"')
-        clauses.append(f'  node["brand"="{esc}"](area.usa);')
-        clauses.append(f'  node["name"="{esc}"](area.usa);')
+        clauses.append(f'  node["brand"="{esc}"]{scope};')
+        clauses.append(f'  node["name"="{esc}"]{scope};')
     body = "\n".join(clauses)
     return (
-        "[out:json][timeout:180];\n"
-        'area["ISO3166-1"="US"][admin_level=2]->.usa;\n'
-        "(\n" + body + "\n);\n"
-        "out body;\n"
+        f"[out:json][timeout:{timeout}];\n"
+        + 'area["ISO3166-1"="US"][admin_level=2]->.usa;\n'
+        + "(\n" + body + "\n);\n"
+        + (f"out body {limit};\n" if limit else "out body;\n")
     )
 
 
-def run_overpass_query(query, retries=3):
+def run_overpass_query(query, retries=3, http_timeout=200, fail_fast=False):
+    """POST a query via the endpoint pool (see overpass_pool.py). Retries
+    after 429/504/network errors once the pool has an endpoint out of its
+    cooldown - which is where Retry-After and the backoff are applied.
+
+    504s and network errors use up `retries`; 429s have their own budget
+    (RATE_LIMIT_RETRIES). With fail_fast, a 504 or network error is raised
+    straight away instead - for sharded tiles, which split rather than retry
+    - while 429s are still waited out."""
     data = query.encode("utf-8")
-    for attempt in range(1, retries + 1):
-        req = urllib.request.Request(
-            OVERPASS_URL,
-            data=data,
-            headers={"User-Agent": USER_AGENT, "Content-Type": "application/x-www-form-urlencoded"},
-            method="POST",
-        )
+    attempt = rate_limited = 0
+    while True:
         try:
-            with urllib.request.urlopen(req, timeout=200) as resp:
-                return json.loads(resp.read().decode("utf-8"))
+            return OVERPASS_POOL.request(data, http_timeout)
+        except NoEndpointAvailable as e:
+            # Not a failed attempt - nothing was sent.
+            print(f"    {e}...")
+            time.sleep(e.wait)
+            continue
         except urllib.error.HTTPError as e:
-            if e.code in (429, 504) and attempt < retries:
-                wait = 15 * attempt
-                print(f"    HTTP {e.code}, retrying in {wait}s ({attempt}/{retries})...")
-                time.sleep(wait)
-                continue
-            raise
-        except urllib.error.URLError as e:
-            if attempt < retries:
-                wait = 10 * attempt
-                print(f"    Network error ({e.reason}), retrying in {wait}s ({attempt}/{retries})...")
-                time.sleep(wait)
-                continue
-            raise
-    return None
+            if e.code == 429:
+                rate_limited += 1
+                if rate_limited > RATE_LIMIT_RETRIES:
+                    raise
+                progress = f"{rate_limited}/{RATE_LIMIT_RETRIES} rate limited"
+            else:
+                attempt += 1
+                if e.code != 504 or fail_fast or attempt >= retries:
+                    raise
+                progress = f"{attempt}/{retries}"
+            reason = f"HTTP {e.code}"
+        except (urllib.error.URLError, TimeoutError) as e:
+            attempt += 1
+            if fail_fast or attempt >= retries:
+                raise
+            reason = f"Network error ({getattr(e, 'reason', e)})"
+            progress = f"{attempt}/{retries}"
+        wait = OVERPASS_POOL.seconds_until_available()
+        print(f"    {reason}, retrying in {wait:.0f}s ({progress})...")
+        time.sleep(wait)
 
 
 def in_us_bounds(lat, lon):
@@ -104,8 +178,9 @@ def in_us_bounds(lat, lon):
 
 
 def extract_osm_records(overpass_json, display_name):
-    records = []
+    records = RecordStore()
     seen_ids = set()
+    osm = SOURCE_BITS["osm"]
     for el in overpass_json.get("elements", []):
         if el.get("type") != "node":
             continue
@@ -118,15 +193,13 @@ def extract_osm_records(overpass_json, display_name):
         tags = el.get("tags", {})
         street_bits = " ".join(filter(None, [tags.get("addr:housenumber"), tags.get("addr:street")]))
         records.append(
-            {
-                "name": tags.get("name", display_name),
-                "lat": lat,
-                "lon": lon,
-                "address": street_bits,
-                "city": tags.get("addr:city", ""),
-                "state": tags.get("addr:state", ""),
-                "sources": ["osm"],
-            }
+            tags.get("name", display_name),
+            lat,
+            lon,
+            street_bits,
+            tags.get("addr:city", ""),
+            tags.get("addr:state", ""),
+            osm,
         )
     return records
 
@@ -137,6 +210,138 @@ def fetch_osm_chain(chain):
     return extract_osm_records(result, chain["display"])
 
 
+# ---------------------------------------------------------------------------
+# Source 1, sharded: the same query split into bbox tiles (--sharded)
+# ---------------------------------------------------------------------------
+# A tile returning this many nodes may have been truncated, so it's split and
+# re-queried instead - except at MIN_TILE_DEG, where it's queried uncapped.
+SHARD_MAX_ELEMENTS = 2000
+SHARD_TIMEOUT = 90
+MIN_TILE_DEG = 1.0
+
+
+class ShardSplit(Exception):
+    """A tile timed out or came back too big - query its quadrants instead."""
+
+
+def initial_tiles(rows, cols):
+    lat_step = (US_BOUNDS["lat_max"] - US_BOUNDS["lat_min"]) / rows
+    lon_step = (US_BOUNDS["lon_max"] - US_BOUNDS["lon_min"]) / cols
+    return [
+        (
+            US_BOUNDS["lat_min"] + r * lat_step,
+            US_BOUNDS["lon_min"] + c * lon_step,
+            US_BOUNDS["lat_min"] + (r + 1) * lat_step,
+            US_BOUNDS["lon_min"] + (c + 1) * lon_step,
+        )
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+def split_tile(bbox):
+    s, w, n, e = bbox
+    mid_lat, mid_lon = (s + n) / 2, (w + e) / 2
+    return [(s, w, mid_lat, mid_lon), (s, mid_lon, mid_lat, e), (mid_lat, w, n, mid_lon), (mid_lat, mid_lon, n, e)]
+
+
+def can_split(bbox):
+    s, w, n, e = bbox
+    return (n - s) / 2 >= MIN_TILE_DEG and (e - w) / 2 >= MIN_TILE_DEG
+
+
+def fetch_tile(names, bbox, cache_dir=None):
+    """Elements for one tile. Raises ShardSplit when the tile should be split
+    rather than retried (a 504, network error or timeout, after one attempt);
+    tiles too small to split get the full retry policy and no result cap.
+    Rate limiting (429s, every endpoint cooling down) is waited out either
+    way - splitting would only multiply the requests. Successful results are
+    cached by query hash, so a rerun only re-queries the tiles that failed
+    last time (the cache is cleared once a run has no failed tiles)."""
+    splittable = can_split(bbox)
+    query = build_overpass_query(names, bbox, SHARD_TIMEOUT, SHARD_MAX_ELEMENTS if splittable else None)
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, hashlib.sha256(query.encode("utf-8")).hexdigest() + ".json")
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)["elements"]
+
+    try:
+        result = run_overpass_query(query, http_timeout=SHARD_TIMEOUT + 20, fail_fast=splittable)
+    except (urllib.error.HTTPError, urllib.error.URLError, TimeoutError) as e:
+        if splittable and (not isinstance(e, urllib.error.HTTPError) or e.code == 504):
+            raise ShardSplit(f"{e}") from e
+        raise
+    # Overpass reports its own query timeout as a 200 with a "remark" and
+    # whatever partial results it had - never trust those.
+    remark = result.get("remark") or ""
+    if "runtime error" in remark:
+        if splittable:
+            raise ShardSplit(remark)
+        raise RuntimeError(remark)
+    elements = result.get("elements", [])
+    if splittable and len(elements) >= SHARD_MAX_ELEMENTS:
+        raise ShardSplit(f"{len(elements)} nodes (cap {SHARD_MAX_ELEMENTS})")
+
+    if cache_path:
+        tmp = cache_path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"bbox": bbox, "elements": elements}, f)
+        os.replace(tmp, cache_path)
+    return elements
+
+
+def fetch_osm_chain_sharded(chain, grid=(3, 6), workers=3, cache_dir=None):
+    """Same result as fetch_osm_chain, built from bbox tiles queried with
+    bounded concurrency. Tiles that time out or hit the size cap are split
+    into quadrants and re-queued; tiles that still fail are reported, and
+    the rest of the country's results are kept. Nodes on tile seams come
+    back from both neighbours and are merged by OSM node id in
+    extract_osm_records(). Returns (records, failed_tile_bboxes)."""
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    names = chain["osm_names"]
+    elements, failed = [], []
+    queried = splits = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(fetch_tile, names, t, cache_dir): t for t in initial_tiles(*grid)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                bbox = pending.pop(fut)
+                queried += 1
+                try:
+                    elements.extend(fut.result())
+                except ShardSplit as e:
+                    splits += 1
+                    print(f"    tile {format_bbox(bbox)}: {e} - splitting")
+                    for sub in split_tile(bbox):
+                        pending[pool.submit(fetch_tile, names, sub, cache_dir)] = sub
+                except Exception as e:
+                    print(f"    tile {format_bbox(bbox)} FAILED: {e}")
+                    failed.append(bbox)
+    print(f"    {queried} tile queries ({splits} split, {len(failed)} failed)")
+    if cache_dir and not failed:
+        # Complete - a later refresh must query every tile afresh.
+        clear_tile_cache(cache_dir)
+    return extract_osm_records({"elements": elements}, chain["display"]), failed
+
+
+def clear_tile_cache(cache_dir):
+    for name in os.listdir(cache_dir):
+        if name.endswith((".json", ".part")):
+            os.remove(os.path.join(cache_dir, name))
+    try:
+        os.rmdir(cache_dir)
+    except OSError:
+        pass  # something else lives there too
+
+
+def format_bbox(bbox):
+    return "({:.2f},{:.2f},{:.2f},{:.2f})".format(*bbox)
+
+
 # ---------------------------------------------------------------------------
 # Source 2: Overture Maps via DuckDB (optional - needs `pip install duckdb`)
 # ---------------------------------------------------------------------------
@@ -150,8 +355,10 @@ def get_duckdb_connection():
 
         con = duckdb.connect()
         con.execute("INSTALL spatial; LOAD spatial;")
-        con.execute("INSTALL httpfs; LOAD httpfs;")
-        con.execute("SET s3_region='us-west-2';")
+        # httpfs is only needed for the real S3 release, not a local fixture.
+        if OVERTURE_SOURCE.startswith("s3://"):
+            con.execute("INSTALL httpfs; LOAD httpfs;")
+            con.execute("SET s3_region='us-west-2';")
         _duckdb_con = con
     return _duckdb_con
 
@@ -159,6 +366,7 @@ def get_duckdb_connection():
 def fetch_overture_chain(chain):
     con = get_duckdb_connection()
     brand = chain["overture_brand"].replace("'", "''")
+    source = OVERTURE_SOURCE.replace("'", "''")
     query = f"""
         SELECT
             names.primary AS name,
@@ -168,7 +376,7 @@ def fetch_overture_chain(chain):
             addresses[1].locality AS city,
             addresses[1].region AS state
         FROM read_parquet(
-            's3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}/theme=places/type=place/*',
+            '{source}',
             filename=true, hive_partitioning=1
         )
         WHERE brand.names.primary ILIKE '{brand}'
@@ -178,23 +386,12 @@ def fetch_overture_chain(chain):
           AND bbox.ymin BETWEEN {US_BOUNDS['lat_min']} AND {US_BOUNDS['lat_max']}
     """
     rows = con.execute(query).fetchall()
-    columns = [d[0] for d in con.description]
-    records = []
-    for row in rows:
-        rec = dict(zip(columns, row))
-        if rec["lat"] is None or rec["lon"] is None or not in_us_bounds(rec["lat"], rec["lon"]):
+    records = RecordStore()
+    overture = SOURCE_BITS["overture"]
+    for name, lon, lat, address, city, state in rows:
+        if lat is None or lon is None or not in_us_bounds(lat, lon):
             continue
-        records.append(
-            {
-                "name": rec["name"] or chain["display"],
-                "lat": rec["lat"],
-                "lon": rec["lon"],
-                "address": rec.get("address") or "",
-                "city": rec.get("city") or "",
-                "state": rec.get("state") or "",
-                "sources": ["overture"],
-            }
-        )
+        records.append(name or chain["display"], lat, lon, address, city, state, overture)
     return records
 
 
@@ -202,13 +399,65 @@ def fetch_overture_chain(chain):
 # Orchestration
 # ---------------------------------------------------------------------------
 def main():
+    global OVERPASS_POOL, OVERTURE_SOURCE
     parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--only", help="fetch just this one chain slug (see CHAINS in chain_config.py)")
     parser.add_argument("--delay", type=float, default=8.0, help="seconds to wait between OSM chain queries")
     parser.add_argument("--osm-only", action="store_true", help="skip Overture even if duckdb is installed")
     parser.add_argument("--dedup-threshold", type=float, default=120.0, help="merge distance in meters (default 120)")
+    parser.add_argument(
+        "--dedup-workers",
+        type=int,
+        default=0,
+        help="dedup chains of %d+ records on this many processes (default 0: single process)" % PARALLEL_DEDUP_MIN,
+    )
+    parser.add_argument(
+        "--overpass-url",
+        action="append",
+        help="Overpass endpoint (e.g. a local stand-in); repeat for a pool (default: OVERPASS_URLS)",
+    )
+    parser.add_argument("--no-hedge", action="store_true", help="never send duplicate requests to a second endpoint")
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=0.9,
+        help="hedge once a query outlasts this percentile of recent latencies (default 0.9)",
+    )
+    parser.add_argument("--overture-parquet", help="local Parquet file/glob to read instead of the S3 release")
+    parser.add_argument("--backoff-scale", type=float, default=1.0, help="multiply Overpass retry waits by this")
+    parser.add_argument("--sharded", action="store_true", help="query OSM in bbox tiles instead of one nationwide query")
+    parser.add_argument(
+        "--shard-grid",
+        type=lambda s: tuple(int(n) for n in s.lower().split("x")),
+        default=(3, 6),
+        help="initial tile grid as ROWSxCOLS over US_BOUNDS (default 3x6)",
+    )
+    parser.add_argument("--shard-workers", type=int, default=3, help="concurrent tile queries (default 3)")
+    parser.add_argument("--shard-cache", help="directory to cache per-tile results in, so reruns redo only failed tiles")
+    parser.add_argument(
+        "--no-publish",
+        action="store_true",
+        help="don't republish stores/data at the end (build.py runs that as its own step)",
+    )
+    parser.add_argument(
+        "--fill-places",
+        action="store_true",
+        help="fill missing city/state from local Census boundaries (see reverse_geocode.py)",
+    )
     args = parser.parse_args()
 
+    OVERPASS_POOL = EndpointPool(
+        args.overpass_url or OVERPASS_URLS,
+        USER_AGENT,
+        RATE_LIMIT_BACKOFF * args.backoff_scale,
+        NETWORK_BACKOFF * args.backoff_scale,
+        hedge=not args.no_hedge,
+        hedge_percentile=args.hedge_percentile,
+    )
+    if args.overture_parquet:
+        OVERTURE_SOURCE = args.overture_parquet
+    started = time.monotonic()
+
     os.makedirs(DATA_DIR, exist_ok=True)
 
     slugs = [args.only] if args.only else list(CHAINS.keys())
@@ -228,20 +477,38 @@ def main():
             print(f"Could not initialize Overture/DuckDB access ({e}) - continuing OSM-only.\n")
             use_overture = False
 
+    geocoder = None
+    if args.fill_places:
+        if os.path.exists(STATES_PATH) and os.path.exists(PLACES_PATH):
+            print("Loading boundary polygons for --fill-places...")
+            geocoder = ReverseGeocoder.from_files()
+        else:
+            print("Boundary files not found - skipping --fill-places (see reverse_geocode.py for the downloads).\n")
+
     summary = []
+    incomplete = []  # (chain, what failed)
     for i, slug in enumerate(slugs):
         chain = CHAINS[slug]
         print(f"[{i + 1}/{len(slugs)}] {chain['display']}")
 
         print("  Fetching OpenStreetMap...")
         try:
-            osm_records = fetch_osm_chain(chain)
+            if args.sharded:
+                cache = os.path.join(args.shard_cache, slug) if args.shard_cache else None
+                osm_records, failed_tiles = fetch_osm_chain_sharded(chain, args.shard_grid, args.shard_workers, cache)
+                if failed_tiles:
+                    print(f"    {len(failed_tiles)} tile(s) failed - partial results kept; rerun with the same "
+                          "--shard-cache to retry just those")
+                    incomplete.append((chain["display"], f"{len(failed_tiles)} OSM tile(s)"))
+            else:
+                osm_records = fetch_osm_chain(chain)
         except Exception as e:
             print(f"    OSM FAILED: {e}")
-            osm_records = []
+            osm_records = RecordStore()
+            incomplete.append((chain["display"], "OSM"))
         print(f"    {len(osm_records)} OSM locations")
 
-        overture_records = []
+        overture_records = RecordStore()
         if use_overture:
             print("  Fetching Overture Maps...")
             try:
@@ -249,18 +516,26 @@ def main():
                 print(f"    {len(overture_records)} Overture locations")
             except Exception as e:
                 print(f"    Overture FAILED: {e}")
-
-        combined = osm_records + overture_records
-        merged = dedupe_nearby(combined, threshold_m=args.dedup_threshold)
-        both_sources = sum(1 for r in merged if len(r["sources"]) > 1)
+                incomplete.append((chain["display"], "Overture"))
+
+        combined = RecordStore()
+        combined.extend(osm_records)
+        combined.extend(overture_records)
+        if args.dedup_workers > 1 and len(combined) >= PARALLEL_DEDUP_MIN:
+            merged = dedupe_nearby_parallel(combined, threshold_m=args.dedup_threshold, workers=args.dedup_workers)
+        else:
+            merged = dedupe_nearby(combined, threshold_m=args.dedup_threshold)
+        if geocoder is not None:
+            cities, states = fill_missing(merged, geocoder)
+            print(f"    filled {cities} missing cities and {states} missing states from boundaries")
+        both_sources = sum(1 for i in range(len(merged)) if merged.source_count(i) > 1)
 
         out_path = os.path.join(DATA_DIR, f"{slug}.json")
-        # id is assigned fresh here (post-merge) rather than carried from either
-        # source, since a merged record may not correspond to a single source id.
-        for idx, r in enumerate(merged):
-            r["id"] = idx
+        # id is assigned fresh here (post-merge, by to_dicts) rather than carried
+        # from either source, since a merged record may not correspond to a
+        # single source id.
         with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(merged, f, indent=1)
+            json.dump(merged.to_dicts(), f, indent=1)
 
         print(
             f"  -> {len(merged)} final locations "
@@ -276,6 +551,15 @@ def main():
     print(f"{'Chain':<16}{'OSM':>8}{'Overture':>10}{'Final':>8}")
     for name, osm_n, ov_n, final_n in summary:
         print(f"{name:<16}{osm_n:>8}{ov_n:>10}{final_n:>8}")
+    if not args.no_publish:
+        print("\n--- Published (see publish_data.py) ---")
+        for name, _, entry, written in publish_dir(DATA_DIR, load_brotli()):
+            if written:
+                print(f"  {name} -> dist/{entry['path']}")
+    print("\n--- Overpass endpoints ---")
+    for line in OVERPASS_POOL.summary_lines():
+        print(line)
+    print(f"\nTotal time: {time.monotonic() - started:.1f}s")
     print(
         "\nCounts reflect each source's current coverage for that brand - sanity-check "
         "against each chain's known approximate store count before trusting the map. "
@@ -283,6 +567,11 @@ def main():
         "the most direct fix is adding it to OpenStreetMap yourself at openstreetmap.org, "
         "which will show up next time you re-run this script."
     )
+    if incomplete:
+        print("\n--- Incomplete (partial data written) ---")
+        for name, what in incomplete:
+            print(f"  {name}: {what} failed")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -2,9 +2,13 @@
 shared by the fetch scripts. Pure standard library, no dependencies.
 """
 import math
+import os
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 
 from chain_config import SUBDEPARTMENT_KEYWORDS
+from record_store import RecordStore
 
 
 def haversine_meters(lat1, lon1, lat2, lon2):
@@ -21,59 +25,264 @@ def is_subdepartment(name):
     return any(k in n for k in SUBDEPARTMENT_KEYWORDS)
 
 
-def _merge_group(records):
+def _merge_group(store, cluster, sub_cache):
     """Collapse a cluster of nearby records (same physical location, seen via
-    one or more sources / sub-department tags) into a single output record."""
+    one or more sources / sub-department tags) into a single record.
+    `cluster` is a list of indexes into `store`, anchor first. Returns
+    (primary, best_addr, sources): the record whose name and position are
+    kept, the one blank address fields are filled from, and the merged
+    sources bitmask."""
     # Prefer a "main store" name over a sub-department one (e.g. skip past
-    # "Walmart Pharmacy" in favor of plain "Walmart") if any exists.
-    primary = next((r for r in records if not is_subdepartment(r.get("name"))), records[0])
+    # "Walmart Pharmacy" in favor of plain "Walmart") if any exists. Names are
+    # interned, so the keyword check runs once per distinct name, not per point.
+    names = store.name
+    primary = cluster[0]
+    for i in cluster:
+        sid = names[i]
+        sub = sub_cache.get(sid)
+        if sub is None:
+            sub = sub_cache[sid] = is_subdepartment(store.strings[sid])
+        if not sub:
+            primary = i
+            break
     # Fill in address/city/state from whichever record has the most complete
     # info, in case the main-store point is missing fields another point has.
-    best_addr = max(records, key=lambda r: sum(bool(r.get(k)) for k in ("address", "city", "state")))
-    merged = dict(primary)
-    for key in ("address", "city", "state"):
-        if not merged.get(key) and best_addr.get(key):
-            merged[key] = best_addr[key]
-    merged["sources"] = sorted({s for r in records for s in r.get("sources", [])})
-    return merged
+    # (String id 0 is the empty string, so a nonzero id means "has a value".)
+    address, city, state = store.address, store.city, store.state
+    if address[primary] and city[primary] and state[primary]:
+        best_addr = primary
+    else:
+        best_addr = max(cluster, key=lambda i: (address[i] > 0) + (city[i] > 0) + (state[i] > 0))
+    sources = 0
+    for i in cluster:
+        sources |= store.sources[i]
+    return primary, best_addr, sources
 
 
-def dedupe_nearby(records, threshold_m=120):
+def _assemble(store, singles, groups):
+    """The deduplicated store: one record per cluster, in order of each
+    cluster's anchor (its first index). `singles` are the anchors of
+    one-record clusters, which are copied as they are - most of them, so the
+    copy is done column by column (RecordStore.take) rather than per record;
+    `groups` are the other clusters, merged by _merge_group()."""
+    sub_cache = {}
+    merged = [(g[0], _merge_group(store, g, sub_cache)) for g in groups]
+    anchors = list(singles)
+    anchors.extend(a for a, _ in merged)
+    anchors.sort()
+    out = RecordStore.take(store, anchors)
+    cols = ((store.address, out.address), (store.city, out.city), (store.state, out.state))
+    for anchor, (primary, best_addr, sources) in merged:
+        k = bisect_left(anchors, anchor)
+        out.lat[k], out.lon[k], out.name[k] = store.lat[primary], store.lon[primary], store.name[primary]
+        for src, dst in cols:
+            dst[k] = src[primary] or src[best_addr]
+        out.sources[k] = sources
+    return out
+
+
+def dedupe_nearby(store, threshold_m=120):
     """Collapses points within threshold_m of each other into one record -
     handles both same-source duplicates (e.g. a store mapped twice) and
     cross-source duplicates (the same store appearing in both OSM and
     Overture), plus the "Walmart" + "Walmart Pharmacy" sub-department case.
 
+    Takes and returns a RecordStore (see record_store.py).
+
     Uses a spatial grid so this stays roughly O(n) instead of O(n^2) - matters
     once a chain's combined OSM+Overture points reach into the thousands.
     """
-    if not records:
-        return []
+    if not len(store):
+        return RecordStore()
 
     cell_deg = threshold_m / 111000  # rough meters-per-degree latitude
+    lats, lons = store.lat, store.lon
+    n = len(store)
 
-    def cell_of(r):
-        return (int(r["lat"] / cell_deg), int(r["lon"] / cell_deg))
-
+    cells = [(int(lats[i] / cell_deg), int(lons[i] / cell_deg)) for i in range(n)]
     grid = defaultdict(list)
-    for idx, r in enumerate(records):
-        grid[cell_of(r)].append(idx)
+    for idx, cell in enumerate(cells):
+        grid[cell].append(idx)
 
-    used = [False] * len(records)
-    output = []
-    for i, r in enumerate(records):
+    used = [False] * n
+    singles, groups = [], []
+    for i in range(n):
         if used[i]:
             continue
         used[i] = True
-        cluster = [r]
-        cy, cx = cell_of(r)
+        cluster = [i]
+        lat, lon = lats[i], lons[i]
+        cy, cx = cells[i]
         for dy in (-1, 0, 1):
             for dx in (-1, 0, 1):
-                for j in grid.get((cy + dy, cx + dx), []):
+                for j in grid.get((cy + dy, cx + dx), ()):
                     if used[j]:
                         continue
-                    if haversine_meters(r["lat"], r["lon"], records[j]["lat"], records[j]["lon"]) <= threshold_m:
-                        cluster.append(records[j])
+                    if haversine_meters(lat, lon, lats[j], lons[j]) <= threshold_m:
+                        cluster.append(j)
                         used[j] = True
-        output.append(_merge_group(cluster))
-    return output
+        if len(cluster) == 1:
+            singles.append(i)
+        else:
+            groups.append(cluster)
+    return _assemble(store, singles, groups)
+
+
+# ---------------------------------------------------------------------------
+# Parallel mode: latitude bands on a process pool
+# ---------------------------------------------------------------------------
+# Set in each worker by _init_band_worker(): the whole store's coordinates
+# and the row-sorted index order, shipped once per process rather than once
+# per band (and not at all where workers are forked).
+_band_data = None
+
+
+def _init_band_worker(lats, lons, order):
+    global _band_data
+    _band_data = (lats, lons, order)
+
+
+def _dedupe_band(lo, hi, core_rows, threshold_m):
+    """Worker: cluster one band - positions lo:hi of the row-sorted order,
+    i.e. its own cell rows (core_rows, inclusive) plus one margin row of
+    each neighbour.
+
+    Points connected to the margin by a chain of neighbours are found first,
+    by flooding out from the margin rows; only that component needs the
+    global view. Everything else in the core is clustered by the same greedy
+    pass as dedupe_nearby() (same visiting order, same used-skip), since no
+    point outside the band can reach it.
+
+    Returns (singles, groups, deferred) in global ids: the anchors of
+    settled one-record clusters, the other settled clusters (anchor first),
+    and {id: neighbour ids in dedupe_nearby()'s visiting order} for the core
+    points that touch the seam."""
+    all_lats, all_lons, order = _band_data
+    # Global order, which the greedy pass's result depends on.
+    ids = sorted(order[lo:hi])
+    n = len(ids)
+    lats = [all_lats[i] for i in ids]
+    lons = [all_lons[i] for i in ids]
+    cell_deg = threshold_m / 111000
+    cells = [(int(lats[k] / cell_deg), int(lons[k] / cell_deg)) for k in range(n)]
+    grid = defaultdict(list)
+    for k, cell in enumerate(cells):
+        grid[cell].append(k)
+    first, last = core_rows
+    is_core = bytes(first <= cy <= last for cy, _ in cells)
+
+    def near(k):
+        lat, lon = lats[k], lons[k]
+        cy, cx = cells[k]
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for j in grid.get((cy + dy, cx + dx), ()):
+                    if j != k and haversine_meters(lat, lon, lats[j], lons[j]) <= threshold_m:
+                        yield j
+
+    seam = bytearray(n)
+    stack = [k for k in range(n) if not is_core[k]]
+    for k in stack:
+        seam[k] = 1
+    while stack:
+        for j in near(stack.pop()):
+            if not seam[j]:
+                seam[j] = 1
+                stack.append(j)
+
+    singles, groups = array("l"), []
+    deferred = {}
+    used = bytearray(n)
+    for i in range(n):
+        if not is_core[i] or used[i]:
+            continue
+        if seam[i]:
+            deferred[ids[i]] = [ids[j] for j in near(i)]
+            continue
+        used[i] = 1
+        cluster = [ids[i]]
+        lat, lon = lats[i], lons[i]
+        cy, cx = cells[i]
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for j in grid.get((cy + dy, cx + dx), ()):
+                    if used[j]:
+                        continue
+                    if haversine_meters(lat, lon, lats[j], lons[j]) <= threshold_m:
+                        cluster.append(ids[j])
+                        used[j] = 1
+        if len(cluster) == 1:
+            singles.append(ids[i])
+        else:
+            groups.append(cluster)
+    return singles, groups, deferred
+
+
+def dedupe_nearby_parallel(store, threshold_m=120, workers=None, bands=None):
+    """Same output as dedupe_nearby(), record for record and in the same
+    order, with the distance work split into latitude bands across a process
+    pool - for big combined inputs (every chain at once, say) where one core
+    is the bottleneck.
+
+    Bands are whole rows of dedupe_nearby()'s grid cells, and each worker also
+    gets one row of margin on either side (one row is exactly threshold_m -
+    the furthest a neighbour can be), so every neighbour a serial pass would
+    compare is available to some worker. Workers get the coordinates once and
+    each band as a slice of the row-sorted order, and send back clusters as
+    ids; the few chains of points that cross a seam come back as neighbour
+    lists and go through the same greedy pass here, in global order. The
+    output is then assembled once, here, from the original store, exactly as
+    dedupe_nearby() does."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    n = len(store)
+    if not n:
+        return RecordStore()
+    workers = workers or os.cpu_count() or 1
+    cell_deg = threshold_m / 111000
+    lats, lons = store.lat, store.lon
+    rows = [int(lat / cell_deg) for lat in lats]
+    order = array("l", sorted(range(n), key=rows.__getitem__))
+    row_of = rows.__getitem__
+
+    # Contiguous runs of cell rows holding roughly equal numbers of points.
+    bands = bands or workers * 4
+    target = max(1, n // bands)
+    jobs = []
+    start = 0
+    while start < n:
+        first = rows[order[start]]
+        last = rows[order[min(n, start + target) - 1]]
+        end = bisect_right(order, last, key=row_of)
+        lo = bisect_left(order, first - 1, key=row_of)
+        hi = bisect_right(order, last + 1, key=row_of)
+        jobs.append((lo, hi, (first, last), threshold_m))
+        start = end
+
+    singles, groups = [], []
+    deferred = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_band_worker,
+                             initargs=(lats, lons, order)) as pool:
+        for band_singles, band_groups, band_deferred in pool.map(_dedupe_band, *zip(*jobs)):
+            singles.extend(band_singles)
+            groups.extend(band_groups)
+            deferred.update(band_deferred)
+
+    # Seam reconciliation: the serial greedy pass, over just the deferred
+    # points (their components are closed under neighbourhood, so nothing
+    # else can interfere).
+    used = set()
+    for i in sorted(deferred):
+        if i in used:
+            continue
+        used.add(i)
+        cluster = [i]
+        for j in deferred[i]:
+            if j not in used:
+                cluster.append(j)
+                used.add(j)
+        if len(cluster) == 1:
+            singles.append(i)
+        else:
+            groups.append(cluster)
+    return _assemble(store, singles, groups)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""kingdom_generator.py - generates random 10-card Dominion kingdoms under the
+rules analyse.py recommends (at least one village and one trasher, a spread
+of costs, optionally only two expansions), fast enough to draw millions of
+them for distribution analysis.
+
+Uses the same inputs as the kingdom page: kingdom/data/dominion_cards.json
+(via card_index.py), mysets.json (owned sets), blacklist.json and
+priority_cards.json ({card id: true} - always dealt, like locking a card on
+the page).
+
+    python scripts/kingdom_generator.py                    # print 5 kingdoms
+    python scripts/kingdom_generator.py --count 20 --sets-per-kingdom 2
+    python scripts/kingdom_generator.py --benchmark 2000000 --workers 8
+    python scripts/kingdom_generator.py --check-uniformity
+
+How it stays rejection-free and exactly uniform: cards are grouped into
+classes by which constraint features they carry (required tags x cost band).
+Whether a kingdom is valid depends only on how many cards it takes from each
+class, and the number of kingdoms for a given per-class count vector is a
+product of binomials. A small DP over (class, slots used, tags covered, band
+counts) counts the valid kingdoms reachable from every state, so sampling is
+a walk that picks each class's count with probability proportional to the
+valid completions behind it, then draws that many distinct cards from the
+class uniformly. Every valid kingdom is equally likely and nothing is ever
+thrown away.
+
+With --sets-per-kingdom N, a set combination is picked first (uniformly among
+combinations that can produce a valid kingdom, promos always allowed - the
+same shape as the page's two-expansion mode) and the kingdom is uniform
+within it.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from card_index import KINGDOM_DATA_DIR, CardIndex, card_cost_value
+
+KINGDOM_SIZE = 10
+DEFAULT_REQUIRED_TAGS = ("isActionSupplier", "isTrashing")
+# Same bands as the page's cheapCards / midCards / expensiveCards lists.
+COST_BANDS = ((None, 3), (4, 5), (6, None))
+DEFAULT_BAND_MINS = (1, 1, 1)
+ALWAYS_ALLOWED_SETS = ("promos",)
+
+
+def load_json(name, default):
+    path = os.path.join(KINGDOM_DATA_DIR, name)
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cost_band(card):
+    value = card_cost_value(card)
+    for b, (lo, hi) in enumerate(COST_BANDS):
+        if (lo is None or value >= lo) and (hi is None or value <= hi):
+            return b
+    raise ValueError(f"no cost band for {card['id']}")
+
+
+class KingdomSampler:
+    """Exact uniform sampler over the valid kingdoms drawable from one pool.
+
+    pool: card positions (in `index`) that may be dealt.
+    locked: positions always included (counted toward the constraints).
+    required_tags: each must appear on at least one card.
+    band_mins: minimum card count per COST_BANDS entry.
+    """
+
+    def __init__(self, index, pool, required_tags=DEFAULT_REQUIRED_TAGS, band_mins=DEFAULT_BAND_MINS,
+                 locked=(), size=KINGDOM_SIZE):
+        self.index = index
+        self.required_tags = tuple(required_tags)
+        self.band_mins = tuple(band_mins)
+        self.locked = tuple(locked)
+        self.size = size
+        self.full_tags = (1 << len(self.required_tags)) - 1
+
+        classes = {}
+        for pos in sorted(set(pool) - set(self.locked)):
+            key = self._features(pos)
+            classes.setdefault(key, []).append(pos)
+        self.class_keys = sorted(classes)
+        self.classes = [classes[k] for k in self.class_keys]
+
+        tm, bc = 0, (0,) * len(self.band_mins)
+        for pos in self.locked:
+            tm, bc = self._add(tm, bc, self._features(pos), 1)
+        self.start = (len(self.locked), tm, bc)
+        self._counts = {}
+        self._tables = {}
+        self._root = None
+        self.total = self._completions(0, self.start) if len(self.locked) <= size else 0
+
+    def _features(self, pos):
+        card = self.index.cards[pos]
+        tm = 0
+        for t, tag in enumerate(self.required_tags):
+            if card.get(tag) is True:
+                tm |= 1 << t
+        return tm, cost_band(card)
+
+    def _add(self, tm, bc, key, n):
+        ctm, band = key
+        if band < len(bc) and bc[band] < self.band_mins[band]:
+            bc = bc[:band] + (min(bc[band] + n, self.band_mins[band]),) + bc[band + 1:]
+        return tm | ctm, bc
+
+    def _valid_end(self, state):
+        k, tm, bc = state
+        return k == self.size and tm == self.full_tags and bc == self.band_mins
+
+    def _step_options(self, i, state):
+        k, tm, bc = state
+        size_i = len(self.classes[i])
+        for n in range(min(size_i, self.size - k) + 1):
+            if n:
+                ntm, nbc = self._add(tm, bc, self.class_keys[i], n)
+            else:
+                ntm, nbc = tm, bc
+            yield n, math.comb(size_i, n), (k + n, ntm, nbc)
+
+    def _completions(self, i, state):
+        """Number of ways to finish a valid kingdom from `state`, drawing only
+        from classes i.. (band counts are capped at their minimum, so states
+        stay few)."""
+        if i == len(self.classes):
+            return 1 if self._valid_end(state) else 0
+        key = (i, state)
+        cached = self._counts.get(key)
+        if cached is None:
+            cached = sum(ways * self._completions(i + 1, nxt) for _, ways, nxt in self._step_options(i, state) if ways)
+            self._counts[key] = cached
+        return cached
+
+    def _table(self, i, state):
+        key = (i, state)
+        table = self._tables.get(key)
+        if table is None:
+            ns, weights, nexts = [], [], []
+            for n, ways, nxt in self._step_options(i, state):
+                w = ways * self._completions(i + 1, nxt)
+                if w:
+                    ns.append(n)
+                    weights.append(w)
+                    nexts.append(nxt)
+            total = sum(weights)
+            cum = list(itertools.accumulate(w / total for w in weights))
+            cum[-1] = 1.0
+            table = self._tables[key] = (cum, ns, nexts)
+        return table
+
+    def _compile(self):
+        """Link every reachable state's table to its successors' tables, so a
+        sample walks plain tuples instead of hashing states."""
+        nodes = {}
+
+        def node(i, state):
+            key = (i, state)
+            if key not in nodes:
+                if i == len(self.classes):
+                    nodes[key] = None
+                else:
+                    cum, ns, nexts = self._table(i, state)
+                    nodes[key] = (cum, ns, [node(i + 1, nxt) for nxt in nexts], self.classes[i])
+            return nodes[key]
+
+        return node(0, self.start)
+
+    def sample(self, rng=random):
+        """One valid kingdom as a list of card positions (locked cards first)."""
+        if not self.total:
+            raise ValueError("no valid kingdom can be drawn from this pool under these constraints")
+        if self._root is None:
+            self._root = self._compile()
+        picked = list(self.locked)
+        rand = rng.random
+        node = self._root
+        while node is not None:
+            cum, ns, nexts, cls = node
+            j = bisect_right(cum, rand()) if len(cum) > 1 else 0
+            if j >= len(ns):
+                j = len(ns) - 1
+            n = ns[j]
+            if n == 1:
+                picked.append(cls[int(rand() * len(cls))])
+            elif n:
+                picked.extend(rng.sample(cls, n))
+            node = nexts[j]
+        return picked
+
+    def expected_inclusion(self):
+        """{position: exact probability the card appears in a sampled kingdom}."""
+        probs = {pos: 1.0 for pos in self.locked}
+        frontier = {self.start: 1.0}
+        for i, cls in enumerate(self.classes):
+            nxt_frontier = {}
+            expected_n = 0.0
+            for state, p in frontier.items():
+                cum, ns, nexts = self._table(i, state)
+                prev = 0.0
+                for c, n, nxt in zip(cum, ns, nexts):
+                    q = p * (c - prev)
+                    prev = c
+                    expected_n += q * n
+                    nxt_frontier[nxt] = nxt_frontier.get(nxt, 0.0) + q
+            for pos in cls:
+                probs[pos] = expected_n / len(cls)
+            frontier = nxt_frontier
+        return probs
+
+
+class KingdomGenerator:
+    """Owned-set pool plus an optional per-kingdom set limit, caching one
+    KingdomSampler per set combination."""
+
+    def __init__(self, index, owned_sets, blacklist=(), locked_ids=(), required_tags=DEFAULT_REQUIRED_TAGS,
+                 band_mins=DEFAULT_BAND_MINS, sets_per_kingdom=0, size=KINGDOM_SIZE):
+        self.index = index
+        self.required_tags = tuple(required_tags)
+        self.band_mins = tuple(band_mins)
+        self.size = size
+        pool_bits = index.mask(groups=["cards"], sets=owned_sets, ids_excluded=blacklist)
+        self.pool = CardIndex.positions(pool_bits)
+        unknown = [c for c in locked_ids if c not in index.by_id]
+        if unknown:
+            raise ValueError(f"unknown locked card id(s): {unknown}")
+        self.locked = [index.by_id[c] for c in locked_ids]
+
+        self.combos = [None]
+        if sets_per_kingdom:
+            limited = sorted(s for s in owned_sets if s not in ALWAYS_ALLOWED_SETS)
+            locked_sets = {index.cards[p]["setId"] for p in self.locked} - set(ALWAYS_ALLOWED_SETS)
+            if len(locked_sets) > sets_per_kingdom:
+                raise ValueError(f"locked cards span {len(locked_sets)} sets, over the limit of {sets_per_kingdom}")
+            k = min(sets_per_kingdom, len(limited))
+            self.combos = [c for c in itertools.combinations(limited, k) if locked_sets <= set(c)]
+        self._samplers = {}
+        self.combos = [c for c in self.combos if self.sampler(c).total]
+        if not self.combos:
+            raise ValueError("no valid kingdom can be drawn under these constraints")
+
+    def sampler(self, combo):
+        s = self._samplers.get(combo)
+        if s is None:
+            pool = self.pool
+            if combo is not None:
+                allowed = set(combo) | set(ALWAYS_ALLOWED_SETS)
+                pool = [p for p in pool if self.index.cards[p]["setId"] in allowed]
+            s = self._samplers[combo] = KingdomSampler(
+                self.index, pool, self.required_tags, self.band_mins, self.locked, self.size
+            )
+        return s
+
+    def sample(self, rng=random):
+        combo = self.combos[rng.randrange(len(self.combos))] if len(self.combos) > 1 else self.combos[0]
+        return self.sampler(combo).sample(rng)
+
+    def names(self, kingdom):
+        cards = sorted((self.index.cards[p] for p in kingdom), key=lambda c: (card_cost_value(c), c["name"]))
+        return [f"{c['name']} ({c['setId']})" for c in cards]
+
+
+def build_generator(args):
+    index = CardIndex.load()
+    mysets = load_json("mysets.json", {})
+    owned = [s for s, enabled in mysets.items() if enabled]
+    blacklist = load_json("blacklist.json", []) if args.blacklist else []
+    priority = load_json("priority_cards.json", {})
+    locked = [c for c, enabled in priority.items() if enabled]
+    return KingdomGenerator(
+        index, owned, blacklist, locked, args.require, args.band_mins, args.sets_per_kingdom
+    )
+
+
+# ---------------------------------------------------------------------------
+# Benchmark / distribution analysis
+# ---------------------------------------------------------------------------
+def _bench_worker(args, count, seed):
+    gen = build_generator(args)
+    rng = random.Random(seed)
+    tally = [0] * len(gen.index.cards)
+    sample = gen.sample
+    start = time.perf_counter()
+    for _ in range(count):
+        for p in sample(rng):
+            tally[p] += 1
+    return time.perf_counter() - start, tally
+
+
+def run_benchmark(args, gen):
+    workers = max(1, args.workers)
+    chunks = [args.benchmark // workers + (1 if w < args.benchmark % workers else 0) for w in range(workers)]
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    print(f"Generating {args.benchmark:,} kingdoms on {workers} worker(s)...")
+    wall = time.perf_counter()
+    if workers == 1:
+        results = [_bench_worker(args, chunks[0], seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_bench_worker, [args] * workers, chunks, [seed + w for w in range(workers)]))
+    wall = time.perf_counter() - wall
+
+    tally = [sum(col) for col in zip(*(t for _, t in results))]
+    rate = args.benchmark / wall
+    print(f"  {wall:.2f}s wall, {rate:,.0f} kingdoms/s ({rate * 60 / 1e6:.2f}M/min, incl. worker start-up)")
+    print(f"  per-worker sampling time: {', '.join(f'{t:.2f}s' for t, _ in results)}")
+
+    by_set = {}
+    for p, n in enumerate(tally):
+        if n:
+            s = gen.index.cards[p]["setId"]
+            by_set[s] = by_set.get(s, 0) + n
+    total = sum(tally)
+    print("\n  Share of dealt cards by set:")
+    for s, n in sorted(by_set.items(), key=lambda x: -x[1]):
+        print(f"    {s:<20}{n / total * 100:6.2f}%")
+    ranked = sorted((n, p) for p, n in enumerate(tally) if n)
+    print("\n  Most / least often dealt:")
+    for n, p in ranked[-5:][::-1] + ranked[:5]:
+        print(f"    {gen.index.cards[p]['name']:<24}{n / args.benchmark * 100:6.2f}% of kingdoms")
+
+
+# ---------------------------------------------------------------------------
+# Uniformity check
+# ---------------------------------------------------------------------------
+def chi2_sf(x, df):
+    """Upper-tail chi-square p-value (Wilson-Hilferty normal approximation -
+    plenty for a pass/fail sanity check, and keeps this standard-library only)."""
+    if df <= 0:
+        return 1.0
+    z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def check_exhaustive(index, pool, required_tags, band_mins, size, draws, rng):
+    """Small pool, every valid kingdom enumerated: sampled kingdom frequencies
+    should fit a flat distribution over exactly that set."""
+    sampler = KingdomSampler(index, pool, required_tags, band_mins, size=size)
+    valid = []
+    for combo in itertools.combinations(sorted(pool), size):
+        tm = 0
+        bc = [0] * len(band_mins)
+        for p in combo:
+            t, b = sampler._features(p)
+            tm |= t
+            bc[b] += 1
+        if tm == sampler.full_tags and all(c >= m for c, m in zip(bc, band_mins)):
+            valid.append(combo)
+    assert len(valid) == sampler.total, (len(valid), sampler.total)
+
+    seen = dict.fromkeys(valid, 0)
+    for _ in range(draws):
+        k = tuple(sorted(sampler.sample(rng)))
+        if k not in seen:
+            raise AssertionError(f"sampled an invalid kingdom: {k}")
+        seen[k] += 1
+    expected = draws / len(valid)
+    chi2 = sum((o - expected) ** 2 / expected for o in seen.values())
+    return len(valid), chi2, chi2_sf(chi2, len(valid) - 1)
+
+
+def check_marginals(sampler, draws, rng):
+    """Full-size pool: each card's observed inclusion rate against the exact
+    rate implied by the DP."""
+    probs = sampler.expected_inclusion()
+    tally = dict.fromkeys(probs, 0)
+    for _ in range(draws):
+        for p in sampler.sample(rng):
+            tally[p] += 1
+    chi2, df = 0.0, 0
+    for p, prob in probs.items():
+        if 0 < prob < 1:
+            e = draws * prob
+            chi2 += (tally[p] - e) ** 2 / (e * (1 - prob))
+            df += 1
+    return df, chi2, chi2_sf(chi2, df)
+
+
+def run_uniformity_check(args, gen):
+    rng = random.Random(args.seed)
+    ok = True
+
+    # A 14-card slice of the real pool that still has a few cards with each
+    # required tag, dealt 4 at a time: small enough to enumerate every valid
+    # kingdom, big enough to exercise every constraint.
+    required = gen.required_tags
+    picked = []
+    for tag in required:
+        with_tag = [p for p in gen.pool if gen.index.cards[p].get(tag) is True and p not in picked]
+        picked += rng.sample(with_tag, min(3, len(with_tag)))
+    rest = [p for p in gen.pool if p not in picked]
+    picked += rng.sample(rest, 14 - len(picked))
+    small_mins = tuple(min(m, 1) for m in gen.band_mins)
+    draws = 200_000
+    n_valid, chi2, p = check_exhaustive(gen.index, picked, required, small_mins, 4, draws, rng)
+    ok &= p > 0.001
+    print(f"Exhaustive check: {n_valid} valid kingdoms, {draws:,} draws, chi2={chi2:.1f} "
+          f"(df={n_valid - 1}), p={p:.3f} {'OK' if p > 0.001 else 'FAIL'}")
+
+    draws = 100_000
+    for combo in gen.combos[:3]:
+        sampler = gen.sampler(combo)
+        df, chi2, p = check_marginals(sampler, draws, rng)
+        ok &= p > 0.001
+        label = "all owned sets" if combo is None else "+".join(combo)
+        print(f"Per-card inclusion ({label}): {sampler.total:.3e} valid kingdoms, {draws:,} draws, "
+              f"chi2={chi2:.1f} (df={df}), p={p:.3f} {'OK' if p > 0.001 else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5, help="kingdoms to print (default 5)")
+    parser.add_argument(
+        "--require",
+        type=lambda s: tuple(filter(None, s.split(","))),
+        default=DEFAULT_REQUIRED_TAGS,
+        help="comma-separated tags every kingdom needs at least one of (default %s)" % ",".join(DEFAULT_REQUIRED_TAGS),
+    )
+    parser.add_argument(
+        "--band-mins",
+        type=lambda s: tuple(int(n) for n in s.split(",")),
+        default=DEFAULT_BAND_MINS,
+        help="minimum cards costing <=3, 4-5 and 6+ (default %s)" % ",".join(map(str, DEFAULT_BAND_MINS)),
+    )
+    parser.add_argument("--sets-per-kingdom", type=int, default=0, help="limit each kingdom to N sets (+promos)")
+    parser.add_argument("--blacklist", action="store_true", help="leave out cards in blacklist.json")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible output")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="time generating N kingdoms and summarize them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="benchmark worker processes")
+    parser.add_argument("--check-uniformity", action="store_true", help="statistically check the sampler is uniform")
+    args = parser.parse_args()
+    if len(args.band_mins) != len(COST_BANDS):
+        parser.error(f"--band-mins needs {len(COST_BANDS)} values")
+
+    try:
+        gen = build_generator(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.check_uniformity:
+        sys.exit(0 if run_uniformity_check(args, gen) else 1)
+    if args.benchmark:
+        run_benchmark(args, gen)
+        return
+
+    rng = random.Random(args.seed)
+    total = sum(gen.sampler(c).total for c in gen.combos)
+    print(f"{len(gen.pool)} cards in pool, {len(gen.combos)} set combination(s), {total:.3e} valid kingdoms\n")
+    for n in range(args.count):
+        print(f"Kingdom {n + 1}: " + ", ".join(gen.names(gen.sample(rng))))
+
+
+if __name__ == "__main__":
+    main()
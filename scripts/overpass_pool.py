@@ -0,0 +1,233 @@
+"""overpass_pool.py - a pool of interchangeable Overpass endpoints with
+per-endpoint health and latency tracking, used by fetch_store_locations.py.
+Pure standard library, no dependencies.
+
+One slow or overloaded public Overpass server shouldn't set the pace of a
+whole refresh, so each query:
+
+- goes to the healthiest endpoint first (not cooling down, fewest recent
+  failures, lowest median latency),
+- is hedged: if no answer has arrived once the pool's recent latency
+  percentile has passed, the same query is also sent to the next-best
+  endpoint and whichever answers first wins,
+- fails over immediately to another endpoint on an error, and
+- puts an endpoint that returns 429 into a cooldown - honoring Retry-After
+  when sent, and growing with each consecutive 429 - so repeat offenders
+  get routed around.
+
+Requests run on daemon threads, so a hedged loser still in flight never
+holds up the process exiting; its outcome is still recorded in the stats.
+"""
+import email.utils
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+LATENCY_WINDOW = 50  # recent successful requests kept per endpoint
+MIN_HEDGE_SAMPLES = 5
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class OverpassEndpoint:
+    def __init__(self, url):
+        self.url = url
+        self.requests = 0
+        self.ok = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.latencies = []
+        self.consecutive_failures = 0
+        self.consecutive_429 = 0
+        self.cooldown_until = 0.0
+
+    def median_latency(self):
+        return percentile(self.latencies, 0.5)
+
+
+class EndpointPool:
+    def __init__(self, urls, user_agent, rate_limit_backoff=15, network_backoff=10, hedge=True,
+                 hedge_percentile=0.9, default_hedge_delay=60.0, min_hedge_delay=5.0):
+        self.endpoints = [OverpassEndpoint(u) for u in urls]
+        self.user_agent = user_agent
+        self.rate_limit_backoff = rate_limit_backoff
+        self.network_backoff = network_backoff
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.lock = threading.Lock()
+
+    # -- selection ---------------------------------------------------------
+    def pick(self, exclude=()):
+        """Best endpoint not in `exclude` and not cooling down, or None."""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [e for e in self.endpoints if e not in exclude and e.cooldown_until <= now]
+            if not candidates:
+                return None
+            # An endpoint with no latency samples yet sorts first, so every
+            # endpoint gets tried early rather than the first one that answered
+            # being stuck with all the traffic.
+            return min(candidates, key=lambda e: (e.consecutive_failures, e.median_latency() or 0.0))
+
+    def seconds_until_available(self):
+        now = time.monotonic()
+        with self.lock:
+            return max(0.0, min(e.cooldown_until for e in self.endpoints) - now)
+
+    def hedge_delay(self):
+        with self.lock:
+            recent = [x for e in self.endpoints for x in e.latencies]
+        if len(recent) < MIN_HEDGE_SAMPLES:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, percentile(recent, self.hedge_percentile))
+
+    # -- bookkeeping -------------------------------------------------------
+    def _record_success(self, ep, latency):
+        with self.lock:
+            ep.ok += 1
+            ep.consecutive_failures = 0
+            ep.consecutive_429 = 0
+            ep.latencies.append(latency)
+            del ep.latencies[:-LATENCY_WINDOW]
+
+    def _record_failure(self, ep, error):
+        with self.lock:
+            ep.errors += 1
+            ep.consecutive_failures += 1
+            if isinstance(error, urllib.error.HTTPError) and error.code == 429:
+                ep.rate_limited += 1
+                ep.consecutive_429 += 1
+                retry_after = parse_retry_after(error.headers.get("Retry-After"))
+                # The first 429 is taken at its word; a server that keeps
+                # saying 429 gets a doubling timeout however short the
+                # Retry-After it sends.
+                penalty = self.rate_limit_backoff * 2 ** (ep.consecutive_429 - 1)
+                if retry_after is not None and ep.consecutive_429 == 1:
+                    wait_s = retry_after
+                else:
+                    wait_s = max(retry_after or 0, penalty)
+            elif isinstance(error, urllib.error.HTTPError):
+                wait_s = self.rate_limit_backoff * ep.consecutive_failures
+            else:
+                wait_s = self.network_backoff * ep.consecutive_failures
+            ep.cooldown_until = max(ep.cooldown_until, time.monotonic() + wait_s)
+
+    # -- requests ----------------------------------------------------------
+    def _send(self, ep, data, http_timeout):
+        with self.lock:
+            ep.requests += 1
+        req = urllib.request.Request(
+            ep.url,
+            data=data,
+            headers={"User-Agent": self.user_agent, "Content-Type": "application/x-www-form-urlencoded"},
+            method="POST",
+        )
+        start = time.monotonic()
+        try:
+            with urllib.request.urlopen(req, timeout=http_timeout) as resp:
+                result = json.loads(resp.read().decode("utf-8"))
+        except Exception as e:
+            self._record_failure(ep, e)
+            raise
+        self._record_success(ep, time.monotonic() - start)
+        return result
+
+    def _start(self, ep, data, http_timeout):
+        fut = Future()
+
+        def run():
+            try:
+                fut.set_result(self._send(ep, data, http_timeout))
+            except BaseException as e:
+                fut.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return fut
+
+    def request(self, data, http_timeout=200):
+        """POST one query, hedging and failing over across the pool. Raises
+        the last error if every endpoint tried fails, or NoEndpointAvailable
+        if all are cooling down."""
+        first = self.pick()
+        if first is None:
+            raise NoEndpointAvailable(self.seconds_until_available())
+        tried = [first]
+        in_flight = {self._start(first, data, http_timeout): first}
+        hedge_eps = set()
+        last_error = None
+        while in_flight:
+            timeout = self.hedge_delay() if self.hedge and len(tried) < len(self.endpoints) else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                nxt = self.pick(exclude=tried)
+                if nxt is None:
+                    # Nothing to hedge to right now - just keep waiting.
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                else:
+                    with self.lock:
+                        nxt.hedges_sent += 1
+                    tried.append(nxt)
+                    hedge_eps.add(nxt)
+                    in_flight[self._start(nxt, data, http_timeout)] = nxt
+                    continue
+            for fut in done:
+                ep = in_flight.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    last_error = e
+                    nxt = self.pick(exclude=tried)
+                    if nxt is not None:
+                        tried.append(nxt)
+                        in_flight[self._start(nxt, data, http_timeout)] = nxt
+                    continue
+                if ep in hedge_eps:
+                    with self.lock:
+                        ep.hedges_won += 1
+                return result
+        raise last_error
+
+    def summary_lines(self):
+        lines = [f"{'Endpoint':<48}{'Reqs':>6}{'OK':>6}{'Err':>6}{'429':>6}{'Hedge':>8}{'p50 s':>8}{'p90 s':>8}"]
+        with self.lock:
+            for e in self.endpoints:
+                p50, p90 = percentile(e.latencies, 0.5), percentile(e.latencies, 0.9)
+                lines.append(
+                    f"{e.url[:47]:<48}{e.requests:>6}{e.ok:>6}{e.errors:>6}{e.rate_limited:>6}"
+                    f"{f'{e.hedges_won}/{e.hedges_sent}':>8}"
+                    f"{(f'{p50:.1f}' if p50 is not None else '-'):>8}{(f'{p90:.1f}' if p90 is not None else '-'):>8}"
+                )
+        return lines
+
+
+class NoEndpointAvailable(Exception):
+    """Every endpoint is cooling down; `wait` is seconds until one isn't."""
+
+    def __init__(self, wait):
+        super().__init__(f"all Overpass endpoints cooling down for {wait:.0f}s")
+        self.wait = wait
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""publish_data.py - turns the site's JSON data files into long-cacheable
+static artifacts: minified, named by content hash, with gzip (and brotli)
+versions alongside, plus a manifest the pages use to find them:
+
+    python scripts/publish_data.py
+
+fetch_store_locations.py and apply_changes.py already finish by publishing
+their own directory; run this after editing data any other way. For every
+top-level *.json in stores/data and mtg/data, and kingdom/data's
+dominion_cards.json and card_index.json (see PUBLISHED), this writes, under
+that directory's dist/:
+
+    <name>.<hash>.json        - minified, hash = sha256 of exactly these bytes
+    <name>.<hash>.json.gz     - gzip -9
+    <name>.<hash>.json.br     - brotli (if installed - see below)
+    manifest.json             - {"files": {"<name>.json": {"path": ...}}}
+
+The pages fetch dist/manifest.json (small, always revalidated) and then the
+hashed file it names, falling back to the plain <name>.json when there's no
+manifest - so nothing breaks before the first publish. A hashed file's
+content never changes under its name, so it can be cached forever: a deploy
+that didn't touch walmart.json leaves its URL, and every browser's cached
+copy, alone.
+
+The .gz/.br files are only for servers/CDNs that serve precompressed
+siblings (nginx gzip_static/brotli_static, Netlify, ...). GitHub Pages,
+which hosts this site (see CNAME), doesn't: it gzips responses itself and
+ignores them, so there the gain is the minification and the cache-forever
+names, not these files. They're written (and committed) anyway so a move to
+such a host needs no rebuild. Brotli needs:
+
+    pip install brotli
+
+and is skipped (with a message) when it isn't installed - publish with it
+installed before committing, or the .br files go missing from dist/.
+
+Unchanged inputs hash to files that already exist and aren't rewritten.
+Hashed files no longer named by the current or previous manifest are pruned,
+so a client still holding the previous manifest never hits a missing file.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+STORES_DATA_DIR = os.path.join(REPO_ROOT, "stores", "data")
+KINGDOM_DATA_DIR = os.path.join(REPO_ROOT, "kingdom", "data")
+MTG_DATA_DIR = os.path.join(REPO_ROOT, "mtg", "data")
+# Which files each directory publishes (None = every top-level *.json). The
+# kingdom page's small hand-edited files (mysets.json, blacklist.json) stay
+# plain: an edit there shouldn't need a publish to show up.
+PUBLISHED = {
+    STORES_DATA_DIR: None,
+    KINGDOM_DATA_DIR: ["dominion_cards.json", "card_index.json"],
+    MTG_DATA_DIR: None,
+}
+DIST_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+HASH_LEN = 12
+
+
+def write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def minify(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def publish_file(src, dist_dir, brotli):
+    """Write one file's hashed artifacts (skipping any already there) and
+    return its manifest entry."""
+    body = minify(src)
+    digest = hashlib.sha256(body).hexdigest()
+    stem = os.path.splitext(os.path.basename(src))[0]
+    name = f"{stem}.{digest[:HASH_LEN]}.json"
+    path = os.path.join(dist_dir, name)
+
+    entry = {"path": name, "sha256": digest, "bytes": len(body)}
+    variants = {"gz": lambda b: gzip.compress(b, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = lambda b: brotli.compress(b, quality=11)
+    written = False
+    for ext, compress in [("", None)] + list(variants.items()):
+        out = f"{path}.{ext}" if ext else path
+        if not os.path.exists(out):
+            write_atomic(out, compress(body) if compress else body)
+            written = True
+        if ext:
+            entry[ext] = os.path.getsize(out)
+    return entry, written
+
+
+def load_brotli():
+    try:
+        import brotli
+    except ImportError:
+        print("brotli not installed - writing gzip only. Install with: pip install brotli")
+        return None
+    return brotli
+
+
+def publish_dir(data_dir, brotli, names=None):
+    """Publish data_dir's JSON files (`names`, or every top-level *.json).
+    Returns a list of (name, original bytes, entry, written) rows for the
+    summary."""
+    dist_dir = os.path.join(data_dir, DIST_NAME)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("files", {})
+
+    rows = []
+    files = {}
+    for name in sorted(names if names is not None else os.listdir(data_dir)):
+        src = os.path.join(data_dir, name)
+        if not name.endswith(".json") or not os.path.isfile(src):
+            continue
+        entry, written = publish_file(src, dist_dir, brotli)
+        files[name] = entry
+        rows.append((name, os.path.getsize(src), entry, written))
+
+    manifest = {"version": MANIFEST_VERSION, "files": files}
+    write_atomic(manifest_path, (json.dumps(manifest, indent=1, sort_keys=True) + "\n").encode("utf-8"))
+
+    keep = {e["path"] for e in files.values()} | {e["path"] for e in previous.values()}
+    for name in os.listdir(dist_dir):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if name != MANIFEST_NAME and base not in keep:
+            os.remove(os.path.join(dist_dir, name))
+    return rows
+
+
+def print_row(name, original, entry, written):
+    br = f"{entry['br']:>9}" if "br" in entry else f"{'-':>9}"
+    print(f"  {name:<28}{original:>10} -> {entry['bytes']:>9} min {entry['gz']:>9} gz {br} br  "
+          f"{entry['path']}{'' if written else '  (unchanged)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--dir",
+        action="append",
+        help="publish just this data directory; repeatable (default: every directory in PUBLISHED)",
+    )
+    args = parser.parse_args()
+
+    brotli = load_brotli()
+    totals = [0, 0, 0, 0]  # original, minified, gzip, brotli bytes
+    if args.dir:
+        targets = [(d, PUBLISHED.get(os.path.abspath(d))) for d in args.dir]
+    else:
+        targets = list(PUBLISHED.items())
+    for data_dir, names in targets:
+        if not os.path.isdir(data_dir):
+            print(f"No such directory: {data_dir}")
+            sys.exit(1)
+        print(os.path.relpath(data_dir, REPO_ROOT))
+        for row in publish_dir(data_dir, brotli, names):
+            print_row(*row)
+            _, original, entry, _ = row
+            totals[0] += original
+            totals[1] += entry["bytes"]
+            totals[2] += entry["gz"]
+            totals[3] += entry.get("br", 0)
+
+    print(f"\nTotal: {totals[0]} bytes -> {totals[1]} minified, {totals[2]} gzip"
+          + (f", {totals[3]} brotli" if brotli is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
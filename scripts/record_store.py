@@ -0,0 +1,155 @@
+"""record_store.py - compact columnar storage for store-location records,
+shared by the fetch and dedup scripts. Pure standard library, no dependencies.
+
+A chain like McDonald's reaches tens of thousands of combined OSM+Overture
+points, and carrying each one as its own dict (plus a fresh copy and a new
+sorted `sources` list per merged cluster) adds up. A RecordStore instead keeps
+one array per field: coordinates as packed doubles, the text fields as indexes
+into a shared interned string table (most records share the same name, and
+many share a city/state), and sources as a small bitmask. Records only turn
+back into dicts at JSON-write time, via to_dicts().
+"""
+from array import array
+
+# Bit per source. Order matters only for to_dicts(), which lists a record's
+# sources alphabetically (the same order the old sorted() lists came out in).
+SOURCE_BITS = {"osm": 1, "overture": 2}
+_SOURCE_NAMES = sorted(SOURCE_BITS)
+
+TEXT_FIELDS = ("name", "address", "city", "state")
+
+
+def source_mask(sources):
+    """Bitmask for an iterable of source names (e.g. ["osm", "overture"])."""
+    mask = 0
+    for s in sources:
+        mask |= SOURCE_BITS[s]
+    return mask
+
+
+def source_names(mask):
+    return [s for s in _SOURCE_NAMES if mask & SOURCE_BITS[s]]
+
+
+class RecordStore:
+    """Parallel-array record container. Index i across every column is one
+    record; strings are stored once in `strings` and referenced by id."""
+
+    __slots__ = ("lat", "lon", "name", "address", "city", "state", "sources", "strings", "_string_ids")
+
+    def __init__(self):
+        self.lat = array("d")
+        self.lon = array("d")
+        self.name = array("I")
+        self.address = array("I")
+        self.city = array("I")
+        self.state = array("I")
+        self.sources = array("B")
+        # id 0 is always the empty string, so a missing field costs nothing
+        # beyond its slot in the column.
+        self.strings = [""]
+        self._string_ids = {"": 0}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def intern(self, s):
+        s = s or ""
+        sid = self._string_ids.get(s)
+        if sid is None:
+            sid = len(self.strings)
+            self.strings.append(s)
+            self._string_ids[s] = sid
+        return sid
+
+    def append(self, name, lat, lon, address="", city="", state="", sources=0):
+        """Add one record. `sources` is a bitmask (see source_mask())."""
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.name.append(self.intern(name))
+        self.address.append(self.intern(address))
+        self.city.append(self.intern(city))
+        self.state.append(self.intern(state))
+        self.sources.append(sources)
+
+    def append_from(self, other, i):
+        """Copy record i of another store into this one, re-interning its
+        strings into this store's table."""
+        s = other.strings
+        self.lat.append(other.lat[i])
+        self.lon.append(other.lon[i])
+        self.name.append(self.intern(s[other.name[i]]))
+        self.address.append(self.intern(s[other.address[i]]))
+        self.city.append(self.intern(s[other.city[i]]))
+        self.state.append(self.intern(s[other.state[i]]))
+        self.sources.append(other.sources[i])
+
+    @classmethod
+    def take(cls, other, rows):
+        """A new store of other's records at `rows` (indexes), in that order.
+        Built column by column with a copy of other's string table, so no
+        string is re-interned."""
+        store = cls()
+        store.strings = list(other.strings)
+        store._string_ids = dict(other._string_ids)
+        store.lat = array("d", map(other.lat.__getitem__, rows))
+        store.lon = array("d", map(other.lon.__getitem__, rows))
+        for col in TEXT_FIELDS:
+            setattr(store, col, array("I", map(getattr(other, col).__getitem__, rows)))
+        store.sources = array("B", map(other.sources.__getitem__, rows))
+        return store
+
+    def extend(self, other):
+        """Append every record of another store. Its string table is remapped
+        once up front rather than per record."""
+        remap = array("I", (self.intern(s) for s in other.strings))
+        self.lat.extend(other.lat)
+        self.lon.extend(other.lon)
+        for col in TEXT_FIELDS:
+            getattr(self, col).extend(remap[sid] for sid in getattr(other, col))
+        self.sources.extend(other.sources)
+
+    def text(self, field, i):
+        return self.strings[getattr(self, field)[i]]
+
+    def source_count(self, i):
+        return bin(self.sources[i]).count("1")
+
+    def to_dicts(self):
+        """The JSON-ready list of record dicts, with `id` assigned by position."""
+        s = self.strings
+        return [
+            {
+                "name": s[self.name[i]],
+                "lat": self.lat[i],
+                "lon": self.lon[i],
+                "address": s[self.address[i]],
+                "city": s[self.city[i]],
+                "state": s[self.state[i]],
+                "sources": source_names(self.sources[i]),
+                "id": i,
+            }
+            for i in range(len(self))
+        ]
+
+    @classmethod
+    def from_dicts(cls, records):
+        store = cls()
+        for r in records:
+            store.append(
+                r.get("name"),
+                r["lat"],
+                r["lon"],
+                r.get("address"),
+                r.get("city"),
+                r.get("state"),
+                source_mask(r.get("sources", [])),
+            )
+        return store
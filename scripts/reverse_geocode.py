@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""reverse_geocode.py - fills in missing city/state on store records by
+looking their coordinates up in local boundary polygons, instead of asking a
+geocoding service one point at a time. Pure standard library, no
+dependencies.
+
+Plenty of OSM/Overture points come without addr:city / addr:state, and
+_merge_group() can only borrow those from another point in the same cluster.
+Every point still has a lat/lon, though, and which city and state polygon it
+falls in answers the question offline.
+
+Boundaries: the US Census cartographic boundary files (public domain) -
+download these two and put them in boundaries/ at the repo root (or point
+--states/--places elsewhere):
+
+    https://www2.census.gov/geo/tiger/GENZ2023/shp/cb_2023_us_state_500k.zip
+    https://www2.census.gov/geo/tiger/GENZ2023/shp/cb_2023_us_place_500k.zip
+
+The zipped shapefiles are read as-is; GeoJSON with the same properties (e.g.
+from ogr2ogr) works too. Places cover incorporated cities and census-
+designated places, so a store out in unincorporated county land keeps an
+empty city - its state still gets filled.
+
+Run it over the existing data:
+
+    python scripts/reverse_geocode.py
+    python scripts/reverse_geocode.py --only walmart
+
+or let fetch_store_locations.py do it on every refresh with --fill-places.
+Only empty fields are ever filled; nothing a source supplied is overwritten.
+A standalone run ends by republishing stores/data, as a fetch does (see
+publish_data.py), unless --no-publish or --dry-run.
+
+How it stays fast over tens of thousands of points: each boundary set gets an
+STR-packed R-tree over its polygons' bounding boxes, so a point is only
+tested against the few polygons whose box contains it; the point-in-polygon
+test itself only looks at the edges in the point's latitude band (bucketed on
+first use of each polygon); and answers are cached by coordinate rounded to
+--precision decimal places, so co-located stores across chains (and, with
+--cache, reruns) reuse them.
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import time
+import zipfile
+from array import array
+
+from publish_data import load_brotli, publish_dir
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "..", "stores", "data")
+BOUNDARY_DIR = os.path.join(SCRIPT_DIR, "..", "boundaries")
+STATES_PATH = os.path.join(BOUNDARY_DIR, "cb_2023_us_state_500k.zip")
+PLACES_PATH = os.path.join(BOUNDARY_DIR, "cb_2023_us_place_500k.zip")
+
+DEFAULT_PRECISION = 4  # ~11 m of latitude - well under any real boundary error
+RTREE_NODE_SIZE = 16
+SMALL_POLYGON_EDGES = 32  # below this, bucketing edges isn't worth it
+EDGES_PER_BAND = 8
+
+_SHP_POLYGON_TYPES = (5, 15, 25)  # Polygon, PolygonZ, PolygonM
+
+
+# ---------------------------------------------------------------------------
+# Polygons
+# ---------------------------------------------------------------------------
+class Polygon:
+    """One boundary feature: all its rings plus its properties. A point is
+    inside when a ray from it crosses the rings' edges an odd number of times,
+    which handles multipart features and holes without telling them apart."""
+
+    __slots__ = ("props", "bbox", "xy", "rings", "_bands", "_band_h")
+
+    def __init__(self, rings, props):
+        self.props = props
+        # Every ring's vertices back to back in one flat x, y, ... array, each
+        # ring closed (last vertex == first); edge v runs from vertex v to v+1.
+        self.xy = array("d")
+        self.rings = []  # (first vertex, last vertex) per ring
+        for ring in rings:
+            if len(ring) < 6:
+                continue
+            first = len(self.xy) // 2
+            self.xy.extend(ring)
+            if ring[0] != ring[-2] or ring[1] != ring[-1]:
+                self.xy.extend(ring[:2])
+            self.rings.append((first, len(self.xy) // 2 - 1))
+        xs, ys = self.xy[0::2], self.xy[1::2]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys)) if xs else (0.0, 0.0, -1.0, -1.0)
+        self._bands = None
+        self._band_h = 0.0
+
+    def _edges(self):
+        for first, last in self.rings:
+            yield from range(first, last)
+
+    def _build_bands(self):
+        """Bucket edges by the horizontal bands they span, so a point only
+        needs the edges of its own band."""
+        miny, maxy = self.bbox[1], self.bbox[3]
+        xy = self.xy
+        n_bands = max(1, (len(xy) // 2) // EDGES_PER_BAND)
+        self._band_h = (maxy - miny) / n_bands or 1.0
+        bands = [array("I") for _ in range(n_bands)]
+        for v in self._edges():
+            y1, y2 = xy[2 * v + 1], xy[2 * v + 3]
+            lo = int((min(y1, y2) - miny) / self._band_h)
+            hi = min(n_bands - 1, int((max(y1, y2) - miny) / self._band_h))
+            for b in range(lo, hi + 1):
+                bands[b].append(v)
+        self._bands = bands
+
+    def contains(self, x, y):
+        minx, miny, maxx, maxy = self.bbox
+        if not (minx <= x <= maxx and miny <= y <= maxy):
+            return False
+        if len(self.xy) // 2 <= SMALL_POLYGON_EDGES:
+            candidates = self._edges()
+        else:
+            if self._bands is None:
+                self._build_bands()
+            candidates = self._bands[min(len(self._bands) - 1, int((y - miny) / self._band_h))]
+        xy = self.xy
+        inside = False
+        for v in candidates:
+            x1, y1, x2, y2 = xy[2 * v], xy[2 * v + 1], xy[2 * v + 2], xy[2 * v + 3]
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+        return inside
+
+
+# ---------------------------------------------------------------------------
+# Readers: zipped/plain ESRI shapefile (+ .dbf attributes), or GeoJSON
+# ---------------------------------------------------------------------------
+def _read_dbf(data):
+    """Attribute rows of a dBASE III table, as {field: stripped string}."""
+    n_records, header_len, record_len = struct.unpack_from("<IHH", data, 4)
+    fields = []
+    pos = 32
+    while data[pos] != 0x0D:
+        name = data[pos:pos + 11].split(b"\0", 1)[0].decode("ascii")
+        fields.append((name, data[pos + 16]))
+        pos += 32
+    rows = []
+    for r in range(n_records):
+        pos = header_len + r * record_len + 1  # skip the deletion flag
+        row = {}
+        for name, length in fields:
+            row[name] = data[pos:pos + length].decode("utf-8", "replace").strip()
+            pos += length
+        rows.append(row)
+    return rows
+
+
+def _read_shp(data):
+    """Polygon rings per record (None for null shapes), each ring a flat
+    x, y, ... array of doubles."""
+    shapes = []
+    pos = 100
+    while pos + 8 <= len(data):
+        _, content_words = struct.unpack_from(">ii", data, pos)
+        pos += 8
+        (shape_type,) = struct.unpack_from("<i", data, pos)
+        if shape_type in _SHP_POLYGON_TYPES:
+            n_parts, n_points = struct.unpack_from("<ii", data, pos + 36)
+            parts = struct.unpack_from(f"<{n_parts}i", data, pos + 44) + (n_points,)
+            points = array("d")
+            start = pos + 44 + 4 * n_parts
+            points.frombytes(data[start:start + 16 * n_points])
+            if sys.byteorder == "big":
+                points.byteswap()
+            shapes.append([points[2 * parts[p]:2 * parts[p + 1]] for p in range(n_parts)])
+        else:
+            shapes.append(None)
+        pos += 2 * content_words
+    return shapes
+
+
+def _load_shapefile(path):
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as z:
+            names = z.namelist()
+            shp = z.read(next(n for n in names if n.lower().endswith(".shp")))
+            dbf = z.read(next(n for n in names if n.lower().endswith(".dbf")))
+    else:
+        base = os.path.splitext(path)[0]
+        with open(base + ".shp", "rb") as f:
+            shp = f.read()
+        with open(base + ".dbf", "rb") as f:
+            dbf = f.read()
+    return [Polygon(rings, props) for rings, props in zip(_read_shp(shp), _read_dbf(dbf)) if rings]
+
+
+def _load_geojson(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    polygons = []
+    for feature in data.get("features", []):
+        geom = feature.get("geometry") or {}
+        if geom.get("type") == "Polygon":
+            parts = [geom["coordinates"]]
+        elif geom.get("type") == "MultiPolygon":
+            parts = geom["coordinates"]
+        else:
+            continue
+        rings = [array("d", (c for pt in ring for c in pt[:2])) for part in parts for ring in part]
+        polygons.append(Polygon(rings, {k: str(v) for k, v in (feature.get("properties") or {}).items()}))
+    return polygons
+
+
+def load_boundaries(path):
+    """Polygons from a shapefile (.shp, or a .zip containing one) or GeoJSON."""
+    if path.lower().endswith((".json", ".geojson")):
+        return _load_geojson(path)
+    return _load_shapefile(path)
+
+
+# ---------------------------------------------------------------------------
+# STR-packed R-tree
+# ---------------------------------------------------------------------------
+class RTree:
+    """Static R-tree over item bounding boxes, bulk-loaded with Sort-Tile-
+    Recursive packing (sort by x into vertical slices, then by y within each,
+    and fill nodes in that order). Built once, queried many times - no
+    inserts."""
+
+    def __init__(self, boxes, node_size=RTREE_NODE_SIZE):
+        # A node is (minx, miny, maxx, maxy, children, is_leaf); a leaf's
+        # children are item indexes.
+        level = self._pack([(b[0], b[1], b[2], b[3], i) for i, b in enumerate(boxes)], node_size, leaf=True)
+        while len(level) > 1:
+            level = self._pack(level, node_size, leaf=False)
+        self.root = level[0] if level else None
+
+    @staticmethod
+    def _pack(entries, node_size, leaf):
+        n_nodes = math.ceil(len(entries) / node_size)
+        slice_len = node_size * math.ceil(math.sqrt(n_nodes))
+        entries = sorted(entries, key=lambda e: e[0] + e[2])
+        nodes = []
+        for s in range(0, len(entries), slice_len):
+            column = sorted(entries[s:s + slice_len], key=lambda e: e[1] + e[3])
+            for k in range(0, len(column), node_size):
+                group = column[k:k + node_size]
+                nodes.append((
+                    min(e[0] for e in group), min(e[1] for e in group),
+                    max(e[2] for e in group), max(e[3] for e in group),
+                    [e[4] for e in group] if leaf else group,
+                    leaf,
+                ))
+        return nodes
+
+    def query_point(self, x, y):
+        """Indexes of every item whose box contains (x, y)."""
+        out = []
+        stack = [self.root] if self.root else []
+        while stack:
+            minx, miny, maxx, maxy, children, leaf = stack.pop()
+            if not (minx <= x <= maxx and miny <= y <= maxy):
+                continue
+            if leaf:
+                out.extend(children)
+            else:
+                stack.extend(children)
+        return out
+
+
+class BoundaryIndex:
+    def __init__(self, polygons):
+        self.polygons = polygons
+        self.tree = RTree([p.bbox for p in polygons])
+
+    def find(self, lon, lat):
+        """The first polygon containing the point, or None. Candidates are
+        tried smallest box first, so an enclave beats the place around it."""
+        hits = [self.polygons[i] for i in self.tree.query_point(lon, lat)]
+        hits.sort(key=lambda p: (p.bbox[2] - p.bbox[0]) * (p.bbox[3] - p.bbox[1]))
+        for p in hits:
+            if p.contains(lon, lat):
+                return p
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Geocoder
+# ---------------------------------------------------------------------------
+class ReverseGeocoder:
+    """(lat, lon) -> (city, state abbreviation), either possibly "". Census
+    properties: places carry NAME and STATEFP (and STUSPS in recent
+    vintages), states carry STUSPS and STATEFP."""
+
+    def __init__(self, states, places, precision=DEFAULT_PRECISION):
+        self.states = BoundaryIndex(states)
+        self.places = BoundaryIndex(places)
+        self.state_by_fips = {p.props.get("STATEFP"): p.props.get("STUSPS", "") for p in states}
+        self.precision = precision
+        self.cache = {}
+        self.hits = self.misses = 0
+        self.fingerprint = None  # identifies the boundary files, for load_cache()
+
+    @classmethod
+    def from_files(cls, states_path=STATES_PATH, places_path=PLACES_PATH, precision=DEFAULT_PRECISION):
+        geocoder = cls(load_boundaries(states_path), load_boundaries(places_path), precision)
+        geocoder.fingerprint = [[os.path.basename(p), os.path.getsize(p)] for p in (states_path, places_path)]
+        return geocoder
+
+    def lookup(self, lat, lon):
+        # The rounded point is what gets geocoded, so a cached answer never
+        # depends on which store happened to ask first.
+        key = (round(lat, self.precision), round(lon, self.precision))
+        result = self.cache.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        lat, lon = key
+        city = state = ""
+        place = self.places.find(lon, lat)
+        if place is not None:
+            city = place.props.get("NAME", "")
+            state = place.props.get("STUSPS") or self.state_by_fips.get(place.props.get("STATEFP"), "")
+        if not state:
+            found = self.states.find(lon, lat)
+            if found is not None:
+                state = found.props.get("STUSPS", "")
+        result = self.cache[key] = (city, state)
+        return result
+
+    def load_cache(self, path):
+        """Reuse answers saved by save_cache() - only if they came from the
+        same boundary data at the same precision."""
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("precision") != self.precision or saved.get("boundaries") != self.fingerprint:
+            return
+        for key, value in saved["cells"].items():
+            lat, lon = key.split(",")
+            self.cache[(float(lat), float(lon))] = tuple(value)
+
+    def save_cache(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "precision": self.precision,
+                "boundaries": self.fingerprint,
+                "cells": {f"{lat!r},{lon!r}": list(v) for (lat, lon), v in self.cache.items()},
+            }, f)
+
+
+def fill_missing(store, geocoder):
+    """Fill empty city/state fields of a RecordStore in place. Returns
+    (cities filled, states filled)."""
+    cities = states = 0
+    for i in range(len(store)):
+        if store.city[i] and store.state[i]:
+            continue
+        city, state = geocoder.lookup(store.lat[i], store.lon[i])
+        if city and not store.city[i]:
+            store.city[i] = store.intern(city)
+            cities += 1
+        if state and not store.state[i]:
+            store.state[i] = store.intern(state)
+            states += 1
+    return cities, states
+
+
+def fill_missing_dicts(records, geocoder):
+    """fill_missing() for a list of record dicts (a stores/data file as-is)."""
+    cities = states = 0
+    for r in records:
+        if r.get("city") and r.get("state"):
+            continue
+        city, state = geocoder.lookup(r["lat"], r["lon"])
+        if city and not r.get("city"):
+            r["city"] = city
+            cities += 1
+        if state and not r.get("state"):
+            r["state"] = state
+            states += 1
+    return cities, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="enrich just this one chain slug")
+    parser.add_argument("--states", default=STATES_PATH, help="state boundaries (.zip/.shp/.geojson)")
+    parser.add_argument("--places", default=PLACES_PATH, help="place boundaries (.zip/.shp/.geojson)")
+    parser.add_argument(
+        "--precision",
+        type=int,
+        default=DEFAULT_PRECISION,
+        help=f"decimal places coordinates are rounded to for caching (default {DEFAULT_PRECISION})",
+    )
+    parser.add_argument("--cache", help="JSON file to keep lookups in between runs")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be filled without writing")
+    parser.add_argument("--no-publish", action="store_true", help="don't republish stores/data at the end")
+    args = parser.parse_args()
+
+    for path in (args.states, args.places):
+        if not os.path.exists(path):
+            print(f"Boundary file not found: {path}\nSee the download links in --help.")
+            sys.exit(1)
+
+    started = time.monotonic()
+    geocoder = ReverseGeocoder.from_files(args.states, args.places, args.precision)
+    print(f"Loaded {len(geocoder.states.polygons)} state and {len(geocoder.places.polygons)} place polygons "
+          f"in {time.monotonic() - started:.1f}s")
+    if args.cache:
+        geocoder.load_cache(args.cache)
+
+    files = sorted(f for f in os.listdir(DATA_DIR) if f.endswith(".json"))
+    if args.only:
+        files = [f for f in files if f == f"{args.only}.json"]
+        if not files:
+            print(f"No data file for {args.only} in {DATA_DIR}")
+            sys.exit(1)
+
+    started = time.monotonic()
+    total = 0
+    for name in files:
+        path = os.path.join(DATA_DIR, name)
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        total += len(records)
+        cities, states = fill_missing_dicts(records, geocoder)
+        print(f"  {name[:-5]:<16} {len(records):>6} records: {cities} cities, {states} states filled")
+        if (cities or states) and not args.dry_run:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(records, f, indent=1)
+
+    elapsed = time.monotonic() - started
+    print(f"Done: {total} records in {elapsed:.1f}s ({geocoder.misses} lookups, {geocoder.hits} cache hits)")
+    if args.cache:
+        geocoder.save_cache(args.cache)
+    if not args.dry_run and not args.no_publish:
+        print("\n--- Published (see publish_data.py) ---")
+        for name, _, entry, written in publish_dir(DATA_DIR, load_brotli()):
+            if written:
+                print(f"  {name} -> dist/{entry['path']}")
+
+
+if __name__ == "__main__":
+    main()
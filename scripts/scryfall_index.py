@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""scryfall_index.py - compiles a Scryfall bulk-data download into a small
+id-indexed file that apply_changes.py reads through mmap, so it can check
+and fill in card details for every id it touches without loading (or
+re-downloading) hundreds of MB of JSON each run. Pure standard library, no
+dependencies.
+
+Get a bulk file from https://scryfall.com/docs/api/bulk-data - "Default
+Cards" (every English-or-only printing, ~500 MB) is what the web UI's ids
+come from; "All Cards" works too, just bigger. Then:
+
+    python scripts/scryfall_index.py build default-cards-20261018.json
+    python scripts/scryfall_index.py lookup 0574d09f-5667-4ecf-bbbb-a1a0ed24068d
+
+The bulk file is streamed (a card at a time, .json or .json.gz), and the
+index written to .scryfall/cards.idx by default:
+
+    header      magic, card count, metadata length (little-endian)
+    metadata    JSON: source file, build time
+    fanout      256 x u32 - how many keys start with a byte <= b (as in a
+                git pack index), so a search starts on 1/256th of the keys
+    keys        count x 16 bytes - the binary UUIDs, sorted
+    offsets     (count + 1) x u64 - where each card's record starts in data
+    data        each card's record: a compact JSON array of RECORD_FIELDS
+
+A lookup is a binary search within one fanout bucket of the fixed-width keys
+plus one slice of the data section - a few page faults on a cold file,
+microseconds warm - so checking thousands of ids per apply stays in the
+milliseconds, and only the pages actually touched are ever read.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import uuid
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(SCRIPT_DIR, "..", ".scryfall", "cards.idx")
+
+MAGIC = b"SCRYIDX1"
+HEADER = struct.Struct("<8sII")  # magic, count, metadata length
+KEY_SIZE = 16
+FANOUT = struct.Struct("<256I")
+OFFSET = struct.Struct("<Q")
+
+# What each record keeps - what the collection files store per card, plus
+# which finishes the printing exists in (to check :foil ids against).
+RECORD_FIELDS = ("name", "set", "collector_number", "oracle_id", "finishes", "lang")
+
+READ_CHUNK = 1 << 20
+
+
+def iter_bulk_cards(path):
+    """Card objects from a Scryfall bulk JSON array, decoded one at a time
+    from a rolling buffer rather than json.load()ing the whole file."""
+    decoder = json.JSONDecoder()
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        while True:
+            # Skip the array's punctuation between objects.
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf, pos = f.read(READ_CHUNK), 0
+                eof = not buf
+                continue
+            try:
+                card, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely an object cut off at the end of the buffer.
+                more = f.read(READ_CHUNK)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            pos = end
+            yield card
+
+
+def card_record(card):
+    """The RECORD_FIELDS of one bulk card, in order."""
+    oracle_id = card.get("oracle_id")
+    if not oracle_id and card.get("card_faces"):
+        # Reversible cards keep their oracle ids on the faces.
+        oracle_id = card["card_faces"][0].get("oracle_id")
+    return [
+        card.get("name", ""),
+        card.get("set", ""),
+        card.get("collector_number", ""),
+        oracle_id or "",
+        card.get("finishes", []),
+        card.get("lang", ""),
+    ]
+
+
+def build_index(bulk_path, out_path=INDEX_PATH):
+    """Stream bulk_path into a new index at out_path. Returns the card count."""
+    entries = []
+    for card in iter_bulk_cards(bulk_path):
+        if card.get("object") != "card" or "id" not in card:
+            continue
+        payload = json.dumps(card_record(card), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        entries.append((uuid.UUID(card["id"]).bytes, payload))
+    entries.sort(key=lambda e: e[0])
+
+    meta = json.dumps({
+        "source": os.path.basename(bulk_path),
+        "built": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "fields": RECORD_FIELDS,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(entries), len(meta)))
+            f.write(meta)
+            fanout = [0] * 256
+            for key, _ in entries:
+                fanout[key[0]] += 1
+            for b in range(1, 256):
+                fanout[b] += fanout[b - 1]
+            f.write(FANOUT.pack(*fanout))
+            f.write(b"".join(key for key, _ in entries))
+            offset = 0
+            for _, payload in entries:
+                f.write(OFFSET.pack(offset))
+                offset += len(payload)
+            f.write(OFFSET.pack(offset))
+            for _, payload in entries:
+                f.write(payload)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(entries)
+
+
+class _Keys:
+    """Sequence view of the sorted key section, for bisect."""
+
+    def __init__(self, mm, start, count):
+        self.mm, self.start, self.count = mm, start, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        p = self.start + i * KEY_SIZE
+        return self.mm[p:p + KEY_SIZE]
+
+
+class ScryfallIndex:
+    """Read-only, memory-mapped view of a built index. Lookups accept the
+    collection's composite keys too ("<id>:foil")."""
+
+    def __init__(self, path=INDEX_PATH):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, meta_len = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not a Scryfall index (rebuild it with scryfall_index.py build)")
+        self.meta = json.loads(self.mm[HEADER.size:HEADER.size + meta_len])
+        self.fanout = (0,) + FANOUT.unpack_from(self.mm, HEADER.size + meta_len)
+        keys_start = HEADER.size + meta_len + FANOUT.size
+        self.offsets_start = keys_start + KEY_SIZE * self.count
+        self.data_start = self.offsets_start + OFFSET.size * (self.count + 1)
+        self._keys = _Keys(self.mm, keys_start, self.count)
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _position(self, scryfall_id):
+        try:
+            key = bytes.fromhex(scryfall_id.split(":", 1)[0].replace("-", ""))
+        except (ValueError, AttributeError):
+            return None
+        if len(key) != KEY_SIZE:
+            return None
+        hi = self.fanout[key[0] + 1]
+        i = bisect.bisect_left(self._keys, key, self.fanout[key[0]], hi)
+        if i < hi and self._keys[i] == key:
+            return i
+        return None
+
+    def __contains__(self, scryfall_id):
+        return self._position(scryfall_id) is not None
+
+    def get(self, scryfall_id):
+        """{field: value} for RECORD_FIELDS, or None if the id isn't indexed."""
+        i = self._position(scryfall_id)
+        if i is None:
+            return None
+        (start,) = OFFSET.unpack_from(self.mm, self.offsets_start + OFFSET.size * i)
+        (end,) = OFFSET.unpack_from(self.mm, self.offsets_start + OFFSET.size * (i + 1))
+        values = json.loads(self.mm[self.data_start + start:self.data_start + end])
+        return dict(zip(RECORD_FIELDS, values))
+
+
+def open_index(path=INDEX_PATH):
+    """ScryfallIndex at path, or None if it hasn't been built."""
+    return ScryfallIndex(path) if os.path.exists(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="index a downloaded bulk-data file")
+    p_build.add_argument("bulk", help="Scryfall bulk JSON (.json or .json.gz)")
+    p_build.add_argument("--out", default=INDEX_PATH, help="index file to write (default .scryfall/cards.idx)")
+    p_lookup = sub.add_parser("lookup", help="print the indexed record for some ids")
+    p_lookup.add_argument("ids", nargs="+")
+    p_lookup.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not os.path.exists(args.bulk):
+            print(f"Bulk file not found: {args.bulk}")
+            sys.exit(1)
+        started = time.monotonic()
+        count = build_index(args.bulk, args.out)
+        print(f"Indexed {count} cards in {time.monotonic() - started:.1f}s -> {args.out} "
+              f"({os.path.getsize(args.out) / 1e6:.1f} MB)")
+        return
+
+    index = open_index(args.index)
+    if index is None:
+        print(f"No index at {args.index} - build one first (see --help).")
+        sys.exit(1)
+    with index:
+        for scryfall_id in args.ids:
+            print(f"{scryfall_id}: {json.dumps(index.get(scryfall_id))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""watch_changes.py - a long-running apply_changes.py: keeps the MTG data
+files loaded and applies each changes*.json export from the web UI the
+moment it lands in a folder, instead of a fresh process reloading and
+reparsing everything per export. Pure standard library, no dependencies.
+
+    python scripts/watch_changes.py --dir ~/Downloads
+
+Leave it running while editing the collection; every Save in the MTG page
+downloads a changes.json (or "changes (1).json", ...) into --dir, which is
+then:
+
+- picked up right away - inotify on Linux, polling every --interval
+  seconds elsewhere (or with --poll) - once its size has stopped changing
+  for --settle ms, so a half-written download is never read,
+- applied to the in-memory collection/decks/binders/boxes with the same
+  functions apply_changes.py uses (including the Scryfall index, if built),
+- renamed to changes_<timestamp>.json in --dir, as apply_changes.py does,
+  once its changes have been flushed to the data files (until then it stays
+  where it is, so a crash before the flush loses nothing); those backups
+  are never picked up again.
+
+Writes are debounced: the data files are flushed (atomically, temp file +
+rename) once no export has arrived for --flush-delay seconds, so a burst of
+saves costs one write, and then mtg/data is republished (publish_data.py).
+A flush or publish that fails (disk full, permissions, ...) is retried,
+backing off up to a minute, with the changes kept in memory meanwhile.
+Anything pending is flushed on Ctrl-C / SIGTERM. If the data files change
+on disk underneath it (a git pull, a manual apply_changes.py run), they're
+reloaded before the next export is applied.
+
+A status file (--status, default .mtg-watch.json at the repo root) is
+rewritten as things happen: queue depth, applied/failed counts, whether a
+flush is pending, and apply latency - for the last export and as p50/p95
+over recent ones - measured from when the file was ready to when its
+changes were in memory.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import copy
+import json
+import os
+import re
+import select
+import signal
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from apply_changes import (
+    apply_binder_changes,
+    apply_collection_changes,
+    apply_deck_changes,
+    check_against_index,
+    load_json,
+    save_json,
+    sort_collection,
+    validate_allocations,
+)
+from publish_data import load_brotli, publish_dir
+from scryfall_index import INDEX_PATH, open_index
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+MTG_DATA_DIR = os.path.join(REPO_ROOT, "mtg", "data")
+STATUS_PATH = os.path.join(REPO_ROOT, ".mtg-watch.json")
+
+# Exports the web UI downloads (browsers add " (1)" etc. on repeats); backups
+# written after applying are changes_YYYYMMDD_HHMMSS[_n].json and are skipped.
+EXPORT_RE = re.compile(r"^changes.*\.json$")
+BACKUP_RE = re.compile(r"^changes_\d{8}_\d{6}(_\d+)?\.json$")
+
+LATENCY_WINDOW = 100
+# Longest wait, in seconds, between retries of a failing flush.
+FLUSH_RETRY_MAX = 60
+
+
+# ---------------------------------------------------------------------------
+# Directory watching: inotify where available, otherwise a timer
+# ---------------------------------------------------------------------------
+class InotifyWaker:
+    """Wakes the loop as soon as a file in the directory is finished writing
+    or moved in. Only used as a signal - the loop rescans the directory
+    either way, so a missed or coalesced event costs nothing."""
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds; True if something happened."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return True
+            if not buf:
+                return True
+            # Drain only - names are picked up by the rescan.
+            pos = 0
+            while pos < len(buf):
+                _, _, _, name_len = struct.unpack_from("iIII", buf, pos)
+                pos += 16 + name_len
+
+
+class PollWaker:
+    def __init__(self, interval):
+        self.interval = interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        return False
+
+
+def make_waker(directory, interval, force_poll):
+    if not force_poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWaker(directory), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return PollWaker(interval), f"polling every {interval:g}s"
+
+
+# ---------------------------------------------------------------------------
+# In-memory data
+# ---------------------------------------------------------------------------
+class MtgData:
+    """collection/decks/binders/boxes as loaded from data_dir, remembering
+    each file's (mtime, size) to notice edits made behind its back."""
+
+    FILES = ("collection", "decks", "binders", "boxes")
+
+    def __init__(self, data_dir, index):
+        self.data_dir = data_dir
+        self.index = index
+        self.stamps = {}
+        self.dirty = False
+        self.load()
+
+    def path(self, name):
+        return os.path.join(self.data_dir, f"{name}.json")
+
+    def _stamp(self, name):
+        try:
+            st = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        for name in self.FILES:
+            setattr(self, name, load_json(self.path(name)))
+            self.stamps[name] = self._stamp(name)
+        if self.index is not None:
+            print("Checking ids against the Scryfall index:")
+            check_against_index(self.collection, self.decks, self.binders, self.boxes, self.index)
+            print()
+
+    def changed_on_disk(self):
+        return any(self._stamp(name) != self.stamps[name] for name in self.FILES)
+
+    def apply(self, changes):
+        """Apply one export all-or-nothing: it's applied to copies, which
+        replace the loaded data only if every change went through, so an
+        export that fails partway leaves nothing behind to be flushed (or
+        applied twice once it's fixed and exported again)."""
+        collection, decks, binders, boxes = copy.deepcopy((self.collection, self.decks, self.binders, self.boxes))
+        cc = changes.get("collection_changes", [])
+        if cc:
+            print(f"Applying {len(cc)} collection change(s):")
+            apply_collection_changes(collection, cc, boxes, self.index)
+        dc = changes.get("deck_changes", [])
+        if dc:
+            print(f"Applying {len(dc)} deck change(s):")
+            apply_deck_changes(decks, dc)
+        bc = changes.get("binder_changes", [])
+        if bc:
+            print(f"Applying {len(bc)} binder change(s):")
+            apply_binder_changes(binders, bc)
+        print("Validating allocations:")
+        validate_allocations(collection, decks, binders)
+        self.collection, self.decks, self.binders, self.boxes = collection, decks, binders, boxes
+        self.dirty = True
+
+    def flush(self):
+        """Write everything back the way apply_changes.py does."""
+        self.collection = sort_collection(self.collection)
+        save_json(self.path("collection"), self.collection)
+        save_json(self.path("decks"), self.decks, sort_keys=False)
+        save_json(self.path("binders"), self.binders, sort_keys=False)
+        save_json(self.path("boxes"), self.boxes, sort_keys=False)
+        for name in self.FILES:
+            self.stamps[name] = self._stamp(name)
+        self.dirty = False
+
+
+# ---------------------------------------------------------------------------
+# Watcher
+# ---------------------------------------------------------------------------
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def backup_path(directory):
+    """changes_<timestamp>.json, as apply_changes.py names it, made unique."""
+    base = f"changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    path = os.path.join(directory, f"{base}.json")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base}_{n}.json")
+        n += 1
+    return path
+
+
+class Watcher:
+    def __init__(self, args, data, waker, mode):
+        self.args = args
+        self.data = data
+        self.waker = waker
+        self.mode = mode
+        self.seen = {}  # path -> (mtime_ns, size, monotonic time that stamp was first seen)
+        self.rejected = {}  # path -> stamp of a version that didn't parse
+        self.queue = []
+        self.unflushed = []  # applied exports, renamed to backups once flushed
+        self.applied = self.failed = 0
+        self.latencies = []
+        self.last = None
+        self.last_flush = None
+        self.last_apply_at = None
+        self.flush_failures = 0
+        self.flush_error = None
+        self.retry_at = None
+        self.started = time.time()
+        self.stopping = False
+
+    # -- scanning ----------------------------------------------------------
+    def scan(self):
+        """Queue exports whose size/mtime has held still for --settle ms.
+        Returns seconds until the next not-yet-settled file might be ready."""
+        now = time.monotonic()
+        settle = self.args.settle / 1000
+        wait = None
+        present = set()
+        for entry in os.scandir(self.args.dir):
+            name = entry.name
+            if not entry.is_file() or not EXPORT_RE.match(name) or BACKUP_RE.match(name):
+                continue
+            path = entry.path
+            present.add(path)
+            if path in self.queue or path in self.unflushed:
+                continue
+            st = entry.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self.rejected.get(path) == stamp:
+                continue
+            prev = self.seen.get(path)
+            if prev is None or prev[:2] != stamp:
+                self.seen[path] = stamp + (now,)
+                prev = self.seen[path]
+            ready_in = prev[2] + settle - now
+            if ready_in <= 0:
+                self.queue.append(path)
+            else:
+                wait = ready_in if wait is None else min(wait, ready_in)
+        for path in list(self.seen):
+            if path not in present:
+                del self.seen[path]
+        self.queue.sort(key=lambda p: (self.seen[p][0], p))
+        return wait
+
+    # -- applying ----------------------------------------------------------
+    def process_queue(self):
+        while self.queue:
+            path = self.queue.pop(0)
+            ready_at = self.seen[path][2] + self.args.settle / 1000
+            self.write_status("applying")
+            start = time.monotonic()
+            name = os.path.basename(path)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    changes = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                # Maybe still being written after all - retried if it changes.
+                print(f"[{self.now()}] ! Could not read {name}: {e}")
+                self.rejected[path] = self.seen[path][:2]
+                self.failed += 1
+                continue
+
+            if self.data.changed_on_disk():
+                if self.data.dirty:
+                    print(f"[{self.now()}] ! Data files changed on disk with unflushed changes pending - "
+                          "keeping the in-memory copy; it will overwrite them on the next flush")
+                else:
+                    print(f"[{self.now()}] Data files changed on disk - reloading")
+                    self.data.load()
+
+            print(f"[{self.now()}] {name} (exported {changes.get('timestamp', 'unknown')})")
+            try:
+                self.data.apply(changes)
+            except Exception as e:
+                print(f"  ! FAILED to apply {name}: {e!r} - none of it applied, left in place")
+                self.rejected[path] = self.seen[path][:2]
+                self.failed += 1
+                continue
+            applied_at = time.monotonic()
+            apply_ms = (applied_at - start) * 1000
+            latency_ms = (applied_at - ready_at) * 1000
+
+            self.unflushed.append(path)
+            self.applied += 1
+            self.latencies.append(latency_ms)
+            del self.latencies[:-LATENCY_WINDOW]
+            self.last_apply_at = applied_at
+            self.last = {
+                "file": name,
+                "backup": None,  # set by the flush that makes it durable
+                "apply_ms": round(apply_ms, 2),
+                "latency_ms": round(latency_ms, 2),
+                "at": self.now(),
+            }
+            print(f"  -> applied in {apply_ms:.1f} ms, backed up once flushed\n")
+
+    # -- flushing ----------------------------------------------------------
+    def flush_due_in(self):
+        """Seconds until a pending flush is due (<= 0: now), or None."""
+        if not self.data.dirty:
+            return None
+        due = self.last_apply_at + self.args.flush_delay
+        if self.retry_at is not None:
+            due = max(due, self.retry_at)
+        return due - time.monotonic()
+
+    def flush(self):
+        """Write the data files, back up the exports they now contain and
+        republish. Returns False (with the data still dirty, and a retry
+        scheduled) if any of it failed."""
+        start = time.monotonic()
+        try:
+            self.data.flush()
+            self.back_up_flushed()
+            if not self.args.no_publish:
+                publish_dir(self.data.data_dir, self.brotli)
+        except Exception as e:
+            # Keep everything in memory and try again; rewriting files that
+            # did get written is harmless.
+            self.data.dirty = True
+            self.flush_failures += 1
+            self.flush_error = repr(e)
+            delay = min(FLUSH_RETRY_MAX, self.args.flush_delay * 2 ** self.flush_failures)
+            self.retry_at = time.monotonic() + delay
+            print(f"[{self.now()}] ! Flush failed: {e!r} - retrying in {delay:.0f} s"
+                  + (f" ({len(self.unflushed)} export(s) left in place)" if self.unflushed else ""))
+            return False
+        self.flush_failures = 0
+        self.flush_error = self.retry_at = None
+        self.last_flush = self.now()
+        print(f"[{self.now()}] Flushed data files in {(time.monotonic() - start) * 1000:.0f} ms")
+        return True
+
+    def back_up_flushed(self):
+        """Rename exports whose changes are now in the data files to
+        changes_<timestamp>.json backups."""
+        while self.unflushed:
+            path = self.unflushed[0]
+            backup = backup_path(self.args.dir)
+            os.replace(path, backup)
+            self.unflushed.pop(0)
+            self.seen.pop(path, None)
+            if self.last is not None and self.last["file"] == os.path.basename(path):
+                self.last["backup"] = os.path.basename(backup)
+            print(f"  {os.path.basename(path)} -> {os.path.basename(backup)}")
+
+    # -- status ------------------------------------------------------------
+    @staticmethod
+    def now():
+        return datetime.now().isoformat(timespec="seconds")
+
+    def write_status(self, state):
+        status = {
+            "pid": os.getpid(),
+            "state": state,
+            "watching": os.path.abspath(self.args.dir),
+            "mode": self.mode,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "updated": self.now(),
+            "queue_depth": len(self.queue),
+            "applied": self.applied,
+            "failed": self.failed,
+            "flush_pending": self.data.dirty,
+            "unflushed_exports": len(self.unflushed),
+            "last_flush": self.last_flush,
+            "flush_error": self.flush_error,
+            "last": self.last,
+            "latency_ms": {
+                "p50": percentile(self.latencies, 0.5),
+                "p95": percentile(self.latencies, 0.95),
+                "max": max(self.latencies) if self.latencies else None,
+                "samples": len(self.latencies),
+            },
+        }
+        directory = os.path.dirname(os.path.abspath(self.args.status))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=1)
+        os.replace(tmp, self.args.status)
+
+    # -- main loop ---------------------------------------------------------
+    def run(self):
+        self.brotli = None if self.args.no_publish else load_brotli()
+        print(f"Watching {os.path.abspath(self.args.dir)} for changes*.json ({self.mode}). Ctrl-C to stop.\n")
+        self.write_status("idle")
+        while not self.stopping:
+            settle_wait = self.scan()
+            if self.queue:
+                self.process_queue()
+                self.write_status("idle")
+                continue
+            due = self.flush_due_in()
+            if due is not None and due <= 0:
+                self.flush()
+                self.write_status("idle")
+                continue
+            if self.args.once and settle_wait is None:
+                break
+            timeouts = [t for t in (settle_wait, due) if t is not None]
+            self.waker.wait(min(timeouts) if timeouts else self.args.interval)
+        if self.data.dirty:
+            self.flush()
+        self.write_status("stopped")
+        return not self.data.dirty
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=".", help="folder exports land in (default: current directory)")
+    parser.add_argument("--data-dir", default=MTG_DATA_DIR, help="MTG data directory (default mtg/data)")
+    parser.add_argument("--scryfall-index", default=INDEX_PATH, help="Scryfall index, used if it exists")
+    parser.add_argument("--status", default=STATUS_PATH, help="status file to keep updated")
+    parser.add_argument("--settle", type=float, default=200, help="ms a file must stay unchanged before it's read")
+    parser.add_argument("--flush-delay", type=float, default=2.0, help="seconds of quiet before writing data files")
+    parser.add_argument("--interval", type=float, default=1.0, help="poll interval in seconds when not using inotify")
+    parser.add_argument("--poll", action="store_true", help="poll even where inotify is available")
+    parser.add_argument("--no-publish", action="store_true", help="don't republish mtg/data after each flush")
+    parser.add_argument("--once", action="store_true", help="apply what's already there, flush and exit")
+    args = parser.parse_args()
+    # Keep a redirected log current while it runs.
+    sys.stdout.reconfigure(line_buffering=True)
+
+    if not os.path.isdir(args.dir):
+        print(f"Not a directory: {args.dir}")
+        sys.exit(1)
+
+    started = time.monotonic()
+    index = open_index(args.scryfall_index)
+    data = MtgData(args.data_dir, index)
+    print(f"Loaded {len(data.collection)} collection entries, {len(data.decks)} decks, {len(data.binders)} binders, "
+          f"{len(data.boxes)} boxes in {(time.monotonic() - started) * 1000:.0f} ms"
+          + (f" (Scryfall index: {len(index)} cards)" if index is not None else ""))
+
+    waker, mode = make_waker(args.dir, args.interval, args.poll)
+    watcher = Watcher(args, data, waker, mode)
+
+    def stop(signum, frame):
+        watcher.stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        flushed = watcher.run()
+    except KeyboardInterrupt:
+        print("\nStopping...")
+        flushed = not data.dirty or watcher.flush()
+        watcher.write_status("stopped")
+    if not flushed:
+        if watcher.unflushed:
+            print(f"Exiting with unflushed changes; {len(watcher.unflushed)} export(s) holding them were left in "
+                  "place to be applied again.")
+        else:
+            print("The data files were written but republishing failed; run publish_data.py.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
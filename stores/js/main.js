@@ -76,9 +76,22 @@ function pointLayerId(slug) {
   return `${slug}-point`;
 }
 
+// Content-hashed copies of the data files (scripts/publish_data.py), found via
+// its manifest - which is always revalidated, while the hashed files it names
+// can be cached for good. Falls back to the plain data/<slug>.json when
+// nothing has been published.
+const dataManifest = fetch('data/dist/manifest.json', { cache: 'no-cache' })
+  .then((res) => (res.ok ? res.json() : { files: {} }))
+  .catch(() => ({ files: {} }));
+
+async function dataUrl(name) {
+  const entry = (await dataManifest).files[name];
+  return entry ? `data/dist/${entry.path}` : `data/${name}`;
+}
+
 async function loadChainData(chain) {
   try {
-    const res = await fetch(`data/${chain.slug}.json`);
+    const res = await fetch(await dataUrl(`${chain.slug}.json`));
     if (!res.ok) return [];
     return await res.json();
   } catch {